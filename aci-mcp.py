@@ -4,12 +4,21 @@ This is a library of tools to facilitate interaction with an ACI Fabric.
 Currently Query and creation tools are included.  Deletions are not currently supported by this tool set.
 Object data should always be queried from the fabric.  No guess or estimate of object information should be made.
 """
-import json, os
+import json, os, asyncio, time
 from fabric import Fabric
+from async_node import AsyncNode
+from ip import resolver
+from cache import Cache
+from snapshot import SnapshotNode
 from fastmcp import FastMCP
 
 mcp = FastMCP("ACI")
 _FABRIC = None
+_FABRIC_LOCK = asyncio.Lock()
+_SNAPSHOT = None
+_TENANTS = {}
+_TENANT_GENERATIONS = {}
+_WRITTEN = False
 
 def _get_settings() -> dict:
   settings = {
@@ -18,7 +27,14 @@ def _get_settings() -> dict:
     "mcp_port": "8000",
     "apic_address": "",
     "username": "",
-    "password": ""
+    "password": "",
+    "cache_ttl": "30",
+    "cache_subscriptions": "false",
+    "snapshot_path": "",
+    "snapshot_mode": "off",
+    "snapshot_timeout": "10",
+    "snapshot_max_age": "3600",
+    "tenant_cache_ttl": "10"
   }
 
   for key in settings:
@@ -37,46 +53,136 @@ def _get_settings() -> dict:
   
   return settings
 
-def get_fabric() -> Fabric:
+# The fabric is created once.  Concurrent first calls wait on the lock and share the fabric the first one created.
+async def get_fabric() -> Fabric:
   global _FABRIC
   if isinstance(_FABRIC, Fabric): 
     return _FABRIC
   
+  async with _FABRIC_LOCK:
+    if isinstance(_FABRIC, Fabric):
+      return _FABRIC
+    
+    settings = _get_settings()
+    
+    cache = Cache(ttl=int(settings["cache_ttl"])) if int(settings["cache_ttl"]) > 0 else None
+    # Resolved off the event loop; the node then finds the address in the resolver cache
+    await resolver.resolve_async(settings["apic_address"])
+    fab = Fabric(AsyncNode(settings["apic_address"], settings["username"], settings["password"], cache=cache,
+                           auto_refresh=True))
+    await fab.login()
+    if cache is not None and str(settings["cache_subscriptions"]).lower() == "true":
+      fab.apic.start_subscriptions()
+    _FABRIC = fab
+    return fab
+
+# Snapshot settings and node, loaded on first use.  The node is None unless snapshot_mode is "serve" or "fallback".
+def get_snapshot() -> dict:
+  global _SNAPSHOT
+  if _SNAPSHOT is not None:
+    return _SNAPSHOT
   settings = _get_settings()
-  
-  fab = Fabric(settings["apic_address"], settings["username"], settings["password"])
-  fab.login()
-  _FABRIC = fab
-  return fab
+  mode = str(settings["snapshot_mode"]).lower()
+  node = None
+  if mode in ["serve", "fallback"] and settings["snapshot_path"]:
+    node = SnapshotNode(settings["snapshot_path"])
+  _SNAPSHOT = {"mode": mode, "timeout": float(settings["snapshot_timeout"]),
+               "max_age": float(settings["snapshot_max_age"]), "node": node,
+               "fabric": Fabric(node) if node is not None else None}
+  return _SNAPSHOT
+
+# Runs a read.  live(fab) is awaited with the APIC fabric; offline(fab) is called with the snapshot fabric.
+# With snapshot_mode "serve" the read is answered from the snapshot, going to the APIC only for objects outside
+# the snapshot, or once the snapshot is stale: older than snapshot_max_age seconds (0 for no limit), or taken
+# before a change made by this server.  With "fallback" it goes to the APIC, and is answered from the snapshot if the APIC fails or does
+# not answer within snapshot_timeout seconds.
+async def _read(live, offline):
+  snapshot = get_snapshot()
+  snap = snapshot["fabric"]
+  if snap is not None and snapshot["mode"] == "serve" and not _snapshot_stale(snapshot):
+    try:
+      return offline(snap)
+    except Exception:
+      pass
+  try:
+    fab = await get_fabric()
+    if snap is None:
+      return await live(fab)
+    return await asyncio.wait_for(live(fab), timeout=snapshot["timeout"])
+  except Exception:
+    if snap is None or snapshot["mode"] != "fallback":
+      raise
+    return offline(snap)
+
+# True if the snapshot no longer reflects the fabric
+def _snapshot_stale(snapshot: dict) -> bool:
+  if _WRITTEN:
+    return True
+  return snapshot["max_age"] > 0 and snapshot["node"].snapshot.age > snapshot["max_age"]
+
+# Runs a read query (see _read)
+async def _query(path, **kwargs):
+  return await _read(lambda fab: fab.query(path, **kwargs).run(), lambda snap: snap.query(path, **kwargs).run())
+
+# fabricNode attributes of the fabric nodes, from the fabric topology, which is kept in memory
+async def _topology_nodes(fab) -> list[dict]:
+  return (await fab.topology.current_async()).nodes()
+
+# Classes of a tenant read by the list tools, fetched together in one batch query
+TENANT_CLASSES = ["fvAEPg", "fvAp", "fvBD", "fvCtx"]
+
+# Per-class Data of a tenant's VRFs, BDs, APs and EPGs.  Back to back list tools for the same tenant share one
+# request: the result is kept for tenant_cache_ttl seconds, or until a tool changes the tenant.
+# A result read while the tenant was changed (its generation moved during the query) is returned but not kept.
+async def _tenant_objects(tenant_name: str) -> dict:
+  entry = _TENANTS.get(tenant_name)
+  if entry is not None and entry["expires"] > time.monotonic():
+    return entry["objects"]
+  generation = _TENANT_GENERATIONS.get(tenant_name, 0)
+  data = await _query(f"uni/tn-{tenant_name}", target="subtree", target_class=",".join(TENANT_CLASSES))
+  objects = data.split(TENANT_CLASSES)
+  ttl = float(_get_settings()["tenant_cache_ttl"])
+  if ttl > 0 and _TENANT_GENERATIONS.get(tenant_name, 0) == generation:
+    _TENANTS[tenant_name] = {"expires": time.monotonic() + ttl, "objects": objects}
+  return objects
+
+# Drops the cached objects of a tenant after a change to it.  The snapshot is stale from then on.
+def _forget_tenant(tenant_name: str):
+  global _WRITTEN
+  _WRITTEN = True
+  _TENANT_GENERATIONS[tenant_name] = _TENANT_GENERATIONS.get(tenant_name, 0) + 1
+  _TENANTS.pop(tenant_name, None)
+
+# Reshape the objects in a query result into dicts, mapping output keys to attribute names.
+# Reads the columnar view of the result rather than each object's attribute dict.
+def _objects(data, fields: dict) -> list[dict]:
+  columns = [data.column(att) for att in fields.values()]
+  return [dict(zip(fields.keys(), values)) for values in zip(*columns)]
+
+# name, alias, description (plus any extra fields) and dn of each object in a query result
+def _named_objects(data, extra: dict | None = None) -> list[dict]:
+  fields = {"name": "name", "alias": "nameAlias", "description": "descr"}
+  fields.update(extra if extra else {})
+  fields["dn"] = "dn"
+  return _objects(data, fields)
 
 @mcp.tool
-def list_tenants() -> list[dict]:
+async def list_tenants() -> list[dict]:
   """
   Get a list of tenants
   returns data on the tenants: 
   name, alias, description, and dn (distinguished name)
   """
-  fab = get_fabric()
-  data = fab.query("fvTenant").run().json
-  rv = []
-  for tn in data:
-    rv.append(
-      {
-        "name": tn["fvTenant"]["attributes"]["name"], 
-        "alias": tn["fvTenant"]["attributes"]["nameAlias"], 
-        "description": tn["fvTenant"]["attributes"]["descr"],
-        "dn": tn["fvTenant"]["attributes"]["dn"]
-      }
-    )
-  return rv
+  data = await _query("fvTenant")
+  return _named_objects(data)
 
 @mcp.tool
-def create_a_tenant(name: str, alias: str = "", description: str = "") -> str:
+async def create_a_tenant(name: str, alias: str = "", description: str = "") -> str:
   """
   Create a tenant in the fabric
   returns as status that indicates if the post was successful
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvTenant": {
       "attributes": {
@@ -88,13 +194,14 @@ def create_a_tenant(name: str, alias: str = "", description: str = "") -> str:
       }
     }
   }
-  rv = fab.post(payload)
-  if rv != 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(name)
+  if response.status_code != 200:
+    return response.text
   return "success"
 
 @mcp.tool
-def modify_tenant(tenant_name: str, 
+async def modify_tenant(tenant_name: str, 
               alias: str | None = None,
               description: str | None = None) -> str:
   """
@@ -105,7 +212,7 @@ def modify_tenant(tenant_name: str,
     alias - the Alias for the tenant
     description - a description for the Tenant
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvTenant": {
       "attributes": {
@@ -117,13 +224,14 @@ def modify_tenant(tenant_name: str,
     payload["fvTenant"]["attributes"]["nameAlias"] = alias
   if description is not None:
     payload["fvTenant"]["attributes"]["descr"] = description
-  rv = fab.post(payload)
-  if not rv == 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(tenant_name)
+  if response.status_code != 200:
+    return response.text
   return "success"
 
 @mcp.tool
-def list_vrfs(tenant_name: str) -> list[dict]:
+async def list_vrfs(tenant_name: str) -> list[dict]:
   """
   Get a list of VRF in a tenant
   args:
@@ -131,23 +239,11 @@ def list_vrfs(tenant_name: str) -> list[dict]:
   returns data on the VRF
     name, alias, description, dn
   """
-  fab = get_fabric()
-  dn = f"uni/tn-{tenant_name}"
-  data = fab.query(dn, target="children", target_class="fvCtx").run().json
-  rv = []
-  for vrf in data:
-    rv.append(
-      {
-        "name": vrf["fvCtx"]["attributes"]["name"],
-        "alias": vrf["fvCtx"]["attributes"]["nameAlias"],
-        "description": vrf["fvCtx"]["attributes"]["descr"],
-        "dn": vrf["fvCtx"]["attributes"]["dn"]
-      }
-    )
-  return rv
+  objects = await _tenant_objects(tenant_name)
+  return _named_objects(objects["fvCtx"])
 
 @mcp.tool
-def create_a_vrf(tenant_name: str,
+async def create_a_vrf(tenant_name: str,
                  name: str,
                  alias: str = "",
                  description: str = "") -> str:
@@ -159,7 +255,7 @@ def create_a_vrf(tenant_name: str,
     alias - (optional) an alias for the new VRF
     description - (optional) a description for the new VRF
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvCtx": {
       "attributes": {
@@ -171,13 +267,14 @@ def create_a_vrf(tenant_name: str,
       }
     }
   }
-  rv = fab.post(payload)
-  if not rv == 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(tenant_name)
+  if response.status_code != 200:
+    return response.text
   return "success"
 
 @mcp.tool
-def modify_vrf(tenant_name: str, 
+async def modify_vrf(tenant_name: str, 
               vrf_name: str,
               alias: str = "",
               description: str = "") -> str:
@@ -190,7 +287,7 @@ def modify_vrf(tenant_name: str,
     alias - the Alias for the VRF
     description - a description for the VRF
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvCtx": {
       "attributes": {
@@ -202,13 +299,14 @@ def modify_vrf(tenant_name: str,
     payload["fvCtx"]["attributes"]["nameAlias"] = alias
   if description:
     payload["fvCtx"]["attributes"]["descr"] = description
-  rv = fab.post(payload)
-  if not rv == 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(tenant_name)
+  if response.status_code != 200:
+    return response.text
   return "success"
 
 @mcp.tool
-def list_bds(tenant_name: str) -> list[dict]:
+async def list_bds(tenant_name: str) -> list[dict]:
   """
   Get a list of Bridge Domains (BDs) in a tenant
   args:
@@ -216,23 +314,11 @@ def list_bds(tenant_name: str) -> list[dict]:
   returns data on the BDs
     name, alias, description, dn
   """
-  fab = get_fabric()
-  dn = f"uni/tn-{tenant_name}"
-  data = fab.query(dn, target="children", target_class="fvBD").run().json
-  rv = []
-  for bd in data:
-    rv.append(
-      {
-        "name": bd["fvBD"]["attributes"]["name"],
-        "alias": bd["fvBD"]["attributes"]["nameAlias"],
-        "description": bd["fvBD"]["attributes"]["descr"],
-        "dn": bd["fvBD"]["attributes"]["dn"]
-      }
-    )
-  return rv
+  objects = await _tenant_objects(tenant_name)
+  return _named_objects(objects["fvBD"])
 
 @mcp.tool
-def get_bd_info(tenant_name: str, bd_name: str) -> dict:
+async def get_bd_info(tenant_name: str, bd_name: str) -> dict:
   """
   Get information about a specific bridge domain
   args:
@@ -241,24 +327,23 @@ def get_bd_info(tenant_name: str, bd_name: str) -> dict:
   returns detailed data on the BD:
     name, alias, description, vrf, subnets, dn, etc.
   """
-  fab = get_fabric()
   dn = f"uni/tn-{tenant_name}/BD-{bd_name}"
-  data = fab.query(dn, subtree="full", include="config").run().json
-  if len(data) == 0: 
+  data = await _query(dn, subtree="full", include="config")
+  bd = data.by_dn(dn)
+  if bd is None: 
     return {}
-  data = data[0]
   rv = {
-    "name": data["fvBD"]["attributes"]["name"],
-    "alias": data["fvBD"]["attributes"]["nameAlias"],
-    "description": data["fvBD"]["attributes"]["descr"],
-    "dn": data["fvBD"]["attributes"]["dn"],
-    "vrf": [c["fvRsCtx"]["attributes"]["tnFvCtxName"] for c in data['fvBD']['children'] if "fvRsCtx" in c][0],
-    "subnets": [c["fvSubnet"]["attributes"]["ip"] for c in data['fvBD']['children'] if "fvSubnet" in c]
+    "name": bd["fvBD"]["attributes"]["name"],
+    "alias": bd["fvBD"]["attributes"]["nameAlias"],
+    "description": bd["fvBD"]["attributes"]["descr"],
+    "dn": bd["fvBD"]["attributes"]["dn"],
+    "vrf": [c["fvRsCtx"]["attributes"]["tnFvCtxName"] for c in data.children_of(dn, "fvRsCtx")][0],
+    "subnets": [c["fvSubnet"]["attributes"]["ip"] for c in data.children_of(dn, "fvSubnet")]
   }
   return rv
 
 @mcp.tool
-def modify_bd(tenant_name: str, 
+async def modify_bd(tenant_name: str, 
               bd_name: str,
               vrf: str = "",
               alias: str = "",
@@ -273,7 +358,7 @@ def modify_bd(tenant_name: str,
     alias - the Alias for the BD
     description - a description for the BD
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvBD": {
       "attributes": {
@@ -295,13 +380,14 @@ def modify_bd(tenant_name: str,
     payload["fvBD"]["attributes"]["nameAlias"] = alias
   if description:
     payload["fvBD"]["attributes"]["descr"] = description
-  rv = fab.post(payload)
-  if not rv == 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(tenant_name)
+  if response.status_code != 200:
+    return response.text
   return "success"
 
 @mcp.tool
-def create_a_bd(tenant_name: str,
+async def create_a_bd(tenant_name: str,
                 name: str,
                 vrf: str,
                 alias: str = "",
@@ -317,7 +403,7 @@ def create_a_bd(tenant_name: str,
     alias - (optional) an alias for the new BD
     description - (optional) a description for the new BD
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvBD": {
       "attributes": {
@@ -337,13 +423,14 @@ def create_a_bd(tenant_name: str,
       ]
     }
   }
-  rv = fab.post(payload)
-  if not rv == 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(tenant_name)
+  if response.status_code != 200:
+    return response.text
   return "success"
   
 @mcp.tool
-def list_aps(tenant_name: str) -> list[dict]:
+async def list_aps(tenant_name: str) -> list[dict]:
   """
   Get a list of Application Profiles (APs) in a tenant
   args:
@@ -351,23 +438,11 @@ def list_aps(tenant_name: str) -> list[dict]:
   returns data on APs:
     name, alias, description, dn (distinguished name)
   """ 
-  fab = get_fabric()
-  dn = f"uni/tn-{tenant_name}"
-  data = fab.query(dn, target="children", target_class="fvAp").run().json
-  rv = []
-  for ap in data:
-    rv.append(
-      {
-        "name": ap["fvAp"]["attributes"]["name"],
-        "alias": ap["fvAp"]["attributes"]["nameAlias"],
-        "description": ap["fvAp"]["attributes"]["descr"],
-        "dn": ap["fvAp"]["attributes"]["dn"]
-      } 
-    )
-  return rv
+  objects = await _tenant_objects(tenant_name)
+  return _named_objects(objects["fvAp"])
 
 @mcp.tool
-def create_an_ap(tenant_name: str,
+async def create_an_ap(tenant_name: str,
                  name: str,
                  alias: str = "",
                  description: str = "") -> str:
@@ -379,7 +454,7 @@ def create_an_ap(tenant_name: str,
     alias - (optional) an alias for the new AP
     description - (optional) a description for the new AP
   """
-  fab = get_fabric()
+  fab = await get_fabric()
   payload = {
     "fvAp": {
       "attributes": {
@@ -390,14 +465,15 @@ def create_an_ap(tenant_name: str,
       }
     }
   }
-  rv = fab.post(payload)
-  if not rv == 200:
-    return fab.apic.response.text
+  response = await fab.send(payload)
+  _forget_tenant(tenant_name)
+  if response.status_code != 200:
+    return response.text
   return "success"
 
 
 @mcp.tool
-def list_epgs(tenant_name: str, ap_name: str | None = None) -> list[dict]:
+async def list_epgs(tenant_name: str, ap_name: str | None = None) -> list[dict]:
   """
   Get a list of Endpoint Groups (EPGs)
   args:
@@ -406,45 +482,24 @@ def list_epgs(tenant_name: str, ap_name: str | None = None) -> list[dict]:
   returns data on EPGs
     name, alias, description, pctag (VXLAN ID used for security tagging), dn
   """
-  fab = get_fabric()
-  dn = f"uni/tn-{tenant_name}"
+  objects = await _tenant_objects(tenant_name)
+  epgs = _named_objects(objects["fvAEPg"], {"pcTag": "pcTag"})
   if ap_name:
-    dn += f"/ap-{ap_name}"
-
-  data = fab.query(dn, target="subtree", target_class="fvAEPg").run().json
-  rv = []
-  for epg in data:
-    rv.append(
-      {
-        "name": epg["fvAEPg"]["attributes"]["name"],
-        "alias": epg["fvAEPg"]["attributes"]["nameAlias"],
-        "description": epg["fvAEPg"]["attributes"]["descr"],
-        "pcTag": epg["fvAEPg"]["attributes"]["pcTag"],
-        "dn": epg["fvAEPg"]["attributes"]["dn"]
-      }
-    )
-  return rv
+    prefix = f"uni/tn-{tenant_name}/ap-{ap_name}/"
+    epgs = [epg for epg in epgs if epg["dn"].startswith(prefix)]
+  return epgs
 
 @mcp.tool
-def list_nodes() -> list[dict]:
+async def list_nodes() -> list[dict]:
   """
   Get a list of fabric nodes (Controllers and switches)
   returns data on the nodes:
   id, name, role, address, model, serial number, and dn
   """
-  fab = get_fabric()
-  data = fab.query("fabricNode").run().json
-  rv = [{
-    "id": node["fabricNode"]["attributes"]["id"],
-    "name": node["fabricNode"]["attributes"]["name"],
-    "role": node["fabricNode"]["attributes"]["role"],
-    "address": node["fabricNode"]["attributes"]["address"],
-    "model": node["fabricNode"]["attributes"]["model"],
-    "serial_number": node["fabricNode"]["attributes"]["serial"],
-    "dn": node["fabricNode"]["attributes"]["dn"]}
-    for node in data
-  ]
-  return rv
+  nodes = await _read(_topology_nodes, lambda snap: snap.topology.current().nodes())
+  fields = {"id": "id", "name": "name", "role": "role", "address": "address", "model": "model",
+            "serial_number": "serial", "dn": "dn"}
+  return [{key: node.get(att) for key, att in fields.items()} for node in nodes]
 
 if __name__ == "__main__":
   # default to HTTP for container use; you can override to "stdio" for local
@@ -0,0 +1,278 @@
+import httpx     # httpx module used for non-blocking Rest API calls
+import json      # JSON module for interacting with JSON formatted data
+
+import node
+import fabric
+import decoder
+from cache import Cache, path_dn
+from interface import interface_id
+from async_query import AsyncQuery   # AsyncQuery module provides logic to manage non-blocking REST API queries
+
+
+# AsyncNode object used to interact with an ACI node without blocking the event loop.
+# Provides the same surface as Node, with the request methods (login, get, post, etc.) as coroutines.
+# Queries created from an AsyncNode are AsyncQuery objects whose run() must be awaited.
+class AsyncNode(node.Node):
+  # client - httpx client to use, e.g. shared with other nodes.  Created (and closed by close) if not provided.
+  def __init__(self, address, username=None, password=None, parent_fabric=None, auto_login=True, cache=None,
+               auto_refresh=False, pool_size=10, timeout=30, client=None, session=None, probe=False,
+               connect_timeout=5):
+    self.__shared_client = client is not None
+    if client is None:
+      client = httpx.AsyncClient(verify=False, timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                                 limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size))
+    self.client = client
+    super().__init__(address, username, password, parent_fabric, auto_login, cache, auto_refresh, pool_size,
+                     session=session, probe=probe, timeout=timeout, connect_timeout=connect_timeout)
+
+  # Handles share this node's httpx client (see Node.handle)
+  def handle(self, address, **kwargs):
+    return super().handle(address, client=self.client, **kwargs)
+
+  # Returns boolean indicating if the current session is accepted by the node.  login_status is the local check.
+  async def check_login(self):
+    response = await self.__get('mo/topology/pod-1/node-1.json')
+    return response is not None and response.status_code != 403
+
+  # Logins are serialized on the session lock
+  async def login(self, username=None, password=None):
+    async with self.session_state.async_lock:
+      return await self.__login(username, password)
+
+  async def __login(self, username=None, password=None):
+    js = self._login_payload(username, password)
+    response = await self.__post('aaaLogin.json', js)
+    return response is not None and self._login_result(response)
+
+  # Logs in again after a 403, unless another task already did since generation was read
+  async def _relogin(self, generation):
+    async with self.session_state.async_lock:
+      if self.session_state.generation != generation:
+        return True
+      self.session_state.check_backoff()
+      return await self.__login()
+
+  async def refresh(self):
+    response = await self.__post('/mo/aaaRefresh.json', {})
+    return response is not None and self._refresh_result(response)
+
+  async def logout(self):
+    payload = {'aaaUser': {'attributes': {'name': self.username}}}
+    response = await self.__post('/mo/aaaLogout.json', payload)
+    return response is not None and self._logout_result(response)
+
+  # Closes the underlying http client and its connection pool, unless the client is shared with another node
+  async def close(self):
+    if not self.__shared_client:
+      await self.client.aclose()
+
+  # private post function to do the real post work
+  async def __post(self, path, payload):
+    js = payload if type(payload) is str else json.dumps(payload)
+    self.health.check()
+    try:
+      response = await self.client.post(self._url(path), content=js)
+    except Exception as e:
+      print(f"Post failed. Exception {e}")
+      self.health.failed()
+      return None
+    self.health.succeeded()
+    self.response = response
+    return response
+
+  # Post function used to send Post messages to node.  Returns the status code.
+  async def post(self, path, payload=None):
+    return (await self.send(path, payload)).status_code
+
+  # Posts to the node and returns the response of this post
+  async def send(self, path, payload=None):
+    path, payload = self._post_target(path, payload)
+    generation = self.session_state.generation
+    response = await self.__post(path, payload)
+    if response is not None and response.status_code == 403:
+      self.session_state.expire()
+      if self.auto_login:
+        if not await self._relogin(generation):
+          raise Exception('Authentication failed.')
+        response = await self.__post(path, payload)
+      else:
+        raise Exception('Unable to post to node. Not currently logged in and "auto_login" is disabled.')
+    if self.cache is not None:
+      self.cache.invalidate_payload(payload)
+    # Gets started before the post may return data from before it
+    self.flight.detach()
+    if response is None:
+      raise Exception(f'Post failed. Unable to post {path} to {self.address}.')
+    return response
+
+  # private get function to do the real get work
+  async def __get(self, path, parameters=None):
+    self.health.check()
+    try:
+      response = await self.client.get(self._url(path), params=parameters)
+    except Exception as e:
+      print(f"Query failed. Exception {e}")
+      self.health.failed()
+      return None
+    self.health.succeeded()
+    self.response = response
+    return response
+
+  # Query node
+  #  Path - url path
+  #  Parameters - query parameters
+  #  raw - return the undecoded response body (bytes), bypassing the cache, e.g. for lazy Data
+  async def get(self, path, parameters=None, raw=False):
+    if raw:
+      return await self.__fetch(path, parameters, raw)
+    if self.cache is not None:
+      value = self.cache.get(path, parameters)
+      if value is None:
+        value = self._narrow(path, parameters)
+      if value is not None:
+        return value
+    return await self.flight.do_async(Cache.key(path, parameters), lambda: self.__fetch(path, parameters))
+
+  # Sends a get (concurrent identical gets are coalesced onto one call) and caches the result
+  async def __fetch(self, path, parameters, raw=False):
+    cache = self.cache if not raw else None
+    generation = cache.generation if cache is not None else None
+    request_parameters = self._request_parameters(parameters) if not raw else parameters
+    session_generation = self.session_state.generation
+    response = await self.__get(path, request_parameters)
+    if response is not None and response.status_code == 403:
+      self.session_state.expire()
+      if self.auto_login:
+        await self._relogin(session_generation)
+        response = await self.__get(path, request_parameters)
+      else:
+        raise Exception('Unable to query node. Not currently logged in and "auto_login" is disabled.')
+    if response is None:
+      raise Exception(f'Query failed. Unable to get {path} from {self.address}.')
+    if raw:
+      return response.content
+    value = self._decode(path, response)
+    if cache is not None and response.status_code == 200:
+      self._cache_result(cache, generation, path, parameters, request_parameters, response, value)
+    return value
+
+  # Async generator streaming a get, yielding each object of imdata as it is parsed from the response body
+  async def stream(self, path, parameters=None, header=None):
+    if path[-5:] != '.json':
+      raise Exception('Only json queries can be streamed.')
+    for attempt in range(2):
+      generation = self.session_state.generation
+      self.health.check()
+      try:
+        async with self.client.stream('GET', self._url(path), params=parameters) as response:
+          self.health.succeeded()
+          if response.status_code == 403 and attempt == 0:
+            self.session_state.expire()
+            if not self.auto_login:
+              raise Exception('Unable to query node. Not currently logged in and "auto_login" is disabled.')
+            await self._relogin(generation)
+            continue
+          if response.status_code != 200:
+            await response.aread()
+            raise Exception(f'Query failed. Error {response.status_code} - {response.text}')
+          parser = decoder.ImdataParser()
+          async for chunk in response.aiter_bytes():
+            for o in parser.feed(chunk):
+              if header is not None and parser.total_count is not None:
+                header['totalCount'] = str(parser.total_count)
+              yield o
+          parser.close()
+          if header is not None and parser.total_count is not None:
+            header['totalCount'] = str(parser.total_count)
+          return
+      except httpx.TransportError:
+        self.health.failed()
+        raise
+
+  # Creates an AsyncQuery object associated with the current node with provided parameters
+  def query(self, path=None, filter=None, target=None, target_class=None, include=None, subtree=None, subtree_class=None,
+            subtree_filter=None, subtree_include=None, order=None, page_size=None):
+    return AsyncQuery(self, path=path, filter=filter, target=target, target_class=target_class, include=include,
+                      subtree=subtree, subtree_class=subtree_class, subtree_filter=subtree_filter,
+                      subtree_include=subtree_include, order=order, page_size=page_size)
+
+  # Creates an AsyncQuery object and runs it
+  async def qr(self, *args, **kwargs):
+    return await self.query(*args, **kwargs).run()
+
+  # Checks to see if an object exists with the provided dn
+  async def exists(self, dn):
+    if not type(dn) == str:
+      if hasattr(dn, 'dn'):
+        dn = dn.dn
+      else:
+        raise Exception('Invalid object type.  Must be string or a class object with a dn property.')
+    data = await self.query(dn, include='naming-only').run()
+    if data.count == 0:
+      return False
+    if 'error' in data.imdata[0].keys():
+      return False
+    return True
+
+  # return the class of an object from its dn
+  async def get_class(self, dn):
+    dn = path_dn(dn)
+    if not await self.exists(dn):
+      raise Exception('%s does not exist or is not a valid dn.' % dn)
+    data = await self.query('mo/%s.json' % dn).run()
+    return list(data.imdata[0].keys())[0]
+
+  async def remove_object(self, dn):
+    response = await self.send(fabric.deleted_payload(await self.query(dn, include='naming').run()))
+    if response.status_code != 200:
+      print(response.text)
+
+  # Node values (dn, id, pod, name and role) need requests, so an AsyncNode loads them with load_values
+  def _init_values(self):
+    raise Exception(f'The values of AsyncNode {self.address} are not loaded.  Load them with await node.load_values() '
+                    f'before reading dn, id, pod, name or role.')
+
+  # Loads dn, id, pod, name and role from the fabric topology, when the node belongs to a fabric, or with a query
+  async def load_values(self):
+    if self.fabric is not None:
+      topology = await self.fabric.topology.current_async()
+      id = topology.by_address(self._system_address())
+      if id is not None:
+        self._set_values(topology.node(id)['topSystem'])
+        return self
+    self._set_values(node.system_values(await self.query(*self._system_query()).run()))
+    return self
+
+  @property
+  def interfaces(self):
+    raise Exception('Node.interfaces is not supported on AsyncNode.  Use '
+                    '(await node.query("l1PhysIf").run()).attribute("id").')
+
+  # Interface objects run blocking queries
+  def interface(self, ifc):
+    raise Exception('Node.interface is not supported on AsyncNode.  Use a Node for Interface objects.')
+
+  # Post config from a file to the apic
+  async def post_file(self, filename, variables=None):
+    path, cfg = self._file_payload(filename, variables)
+    return self._file_result(path, await self.send(path, cfg))
+
+  async def cdp_neighbors(self, ifc=None):
+    if not self._values_loaded:
+      await self.load_values()
+    if ifc is None:
+      nbrs = await self.query('cdpAdjEp').run()
+    else:
+      nbrs = await self.query(f'{self.dn}/cdp/inst/if-[{interface_id(ifc)}]', target='subtree',
+                              target_class='cdpAdjEp').run()
+    return self._cdp_list(nbrs)
+
+  async def lldp_neighbors(self, ifc=None):
+    if not self._values_loaded:
+      await self.load_values()
+    if ifc is None:
+      nbrs = await self.query('lldpAdjEp').run()
+    else:
+      nbrs = await self.query(f'{self.dn}/lldp/inst/if-[{interface_id(ifc)}]', target='subtree',
+                              target_class='lldpAdjEp').run()
+    return self._lldp_list(nbrs)
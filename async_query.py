@@ -0,0 +1,108 @@
+import async_node
+import asyncio
+import json
+import data
+from query import Query
+
+
+# AsyncQuery object used to run a query through an AsyncNode without blocking the event loop
+# Parameters are managed exactly as with Query; run() is a coroutine.
+class AsyncQuery(Query):
+  @property
+  def node(self):
+    return self.__node
+
+  @node.setter
+  def node(self, the_node):
+    if not isinstance(the_node, async_node.AsyncNode):
+      raise Exception("Node parameter must be an object of the AsyncNode class.")
+    self.__node = the_node
+
+  # Resolving the class of an mo path requires a query, which can not be awaited from a property.
+  # "attribute=value" filters on mo paths are resolved by run, iter_pages and stream before the query is sent.
+  @property
+  def output_class(self):
+    if self.path[:6] == 'class/':
+      return self.path[6:self.path.rfind('.')]
+    raise Exception('Unable to resolve the class of an mo path for an async query.  Use a full filter expression.')
+
+  async def __resolve_filter(self):
+    if self.filter_shortcut is not None and self.path[:6] != 'class/':
+      self._resolve_filter(await self.node.get_class(self.path))
+
+  # lazy - keep the response body undecoded and decode attributes on access (see data.Data).  Bypasses the cache.
+  async def run(self, path=None, show_output=False, show_parameters=False, show_count=False, lazy=False):
+    if path is not None:
+      self.path = path
+    if path is not None and type(path) is not str:
+      raise Exception('Invalid path.  Must be string.')
+    if self.path is None:
+      raise Exception('Path has not been set.')
+    await self.__resolve_filter()
+    if show_parameters:
+      print(json.dumps(self.parameters, indent=2))
+    if lazy:
+      if self.page_size is not None:
+        raise Exception('Paged queries can not be run lazily.')
+      self._set_data(data.Data(await self.node.get(self.path, self.parameters, raw=True), lazy=True))
+    elif self.page_size is None:
+      self._set_data(data.Data(await self.node.get(self.path, self.parameters)))
+    else:
+      self._set_data(await self.__run_pages())
+    if show_count:
+      print(self.data.count)
+    if show_output:
+      self.data.print()
+    return self.data
+
+  # Runs one query for several classes and returns a Data per class (see Query.run_batch)
+  async def run_batch(self, classes=None):
+    classes = self.batch_classes(classes)
+    return (await self.run()).split(classes)
+
+  # Fetches page 0 to learn the totalCount, then the remaining pages concurrently (at most "workers" at a time)
+  async def __run_pages(self):
+    first = await self.__get_page(0)
+    pages = self.page_count(first['totalCount'])
+    imdata = list(first['imdata'])
+    if pages > 1:
+      limit = asyncio.Semaphore(self.workers)
+
+      async def bounded(page):
+        async with limit:
+          return await self.__get_page(page)
+
+      for page in await asyncio.gather(*[bounded(page) for page in range(1, pages)]):
+        imdata.extend(page['imdata'])
+    return data.Data({'totalCount': first['totalCount'], 'imdata': imdata})
+
+  async def __get_page(self, page):
+    return await self.node.get(self.path, self.page_parameters(page))
+
+  # Async generator yielding a Data object for each page of the query
+  async def iter_pages(self, page_size=None):
+    if page_size is not None:
+      self.page_size = page_size
+    if self.path is None:
+      raise Exception('Path has not been set.')
+    if self.page_size is None:
+      raise Exception('Page size has not been set.')
+    await self.__resolve_filter()
+    page = 0
+    pages = 1
+    while page < pages:
+      content = await self.__get_page(page)
+      pages = self.page_count(content['totalCount'])
+      yield data.Data(content)
+      page += 1
+
+  # Async generator yielding each object of the query result as it is parsed from the response
+  async def stream(self, header=None):
+    if self.path is None:
+      raise Exception('Path has not been set.')
+    await self.__resolve_filter()
+    async for o in self.node.stream(self.path, self.parameters, header):
+      yield o
+
+  def load(self, filename):
+    raise Exception('Loading a saved query is not supported for AsyncQuery.  Load with Query.')
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the JSON decode step of Node.get.
+Compares the previous path (decode the body to str, then json.loads) with each decoder.py backend
+parsing the raw bytes.  Pass recorded APIC responses (e.g. a saved class/fvCEp.json body) as arguments,
+or run without arguments to use a synthetic fvCEp payload.
+
+  python benchmarks/bench_decode.py [--objects 100000] [--repeat 5] [payload.json ...]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import decoder
+
+
+# Synthetic class query response shaped like an fvCEp query
+def synthetic_payload(objects):
+  imdata = []
+  for i in range(objects):
+    imdata.append({'fvCEp': {'attributes': {
+      'annotation': '', 'childAction': '', 'contName': '', 'descr': '',
+      'dn': f'uni/tn-tenant{i % 50}/ap-app{i % 20}/epg-epg{i % 200}/cep-00:50:56:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}',
+      'encap': f'vlan-{100 + i % 3000}', 'extMngdBy': '', 'id': '0', 'idepdn': '', 'ip': f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}',
+      'lcC': 'learned', 'lcOwn': 'local', 'mac': f'00:50:56:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}',
+      'mcastAddr': 'not-applicable', 'modTs': '2024-01-01T00:00:00.000+00:00', 'monPolDn': 'uni/tn-common/monepg-default',
+      'name': f'00:50:56:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}', 'nameAlias': '', 'status': '', 'uid': '0',
+      'userdom': 'all', 'uuid': '', 'vmmSrc': ''}}})
+  return json.dumps({'totalCount': str(objects), 'imdata': imdata}).encode()
+
+
+def best_time(function, content, repeat):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function(content)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None or elapsed < best else best
+  return best
+
+
+def run(name, content, repeat):
+  print(f'{name}: {len(content) / 1024 / 1024:.1f} MB')
+  baseline = best_time(lambda c: json.loads(c.decode('utf-8')), content, repeat)
+  print(f'  {"text + json.loads (previous)":32} {baseline * 1000:9.1f} ms')
+  for backend, loads in decoder.backends.items():
+    elapsed = best_time(loads, content, repeat)
+    print(f'  {"bytes + " + backend:32} {elapsed * 1000:9.1f} ms  {baseline / elapsed:5.2f}x')
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Benchmark JSON decoding of APIC responses.')
+  parser.add_argument('payloads', nargs='*', help='recorded APIC JSON responses')
+  parser.add_argument('--objects', type=int, default=100000, help='objects in the synthetic payload')
+  parser.add_argument('--repeat', type=int, default=5, help='runs per decoder; the best time is reported')
+  args = parser.parse_args()
+  if len(args.payloads) == 0:
+    run(f'synthetic fvCEp x {args.objects}', synthetic_payload(args.objects), args.repeat)
+  for filename in args.payloads:
+    with open(filename, 'rb') as f:
+      run(filename, f.read(), args.repeat)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Memory and time of lazy versus eager Data on large class query responses.
+Reads the attributes an MCP list tool reads (name, nameAlias, descr, dn by default) from a lazy Data and
+reports Data.memory(), which compares the lazy projection with fully decoded content.  Pass recorded APIC
+responses as arguments, or run without arguments to use a synthetic fvCEp payload.
+
+  python benchmarks/bench_lazy.py [--objects 100000] [--fields name,nameAlias,descr,dn] [payload.json ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data import Data
+from bench_decode import synthetic_payload
+
+
+def run(name, content, fields):
+  print(f'{name}: {len(content) / 1024 / 1024:.1f} MB')
+  start = time.perf_counter()
+  eager = Data(content).attribute(fields)
+  eager_time = time.perf_counter() - start
+  start = time.perf_counter()
+  data = Data(content, lazy=True)
+  lazy = data.attribute(fields)
+  lazy_time = time.perf_counter() - start
+  if lazy != eager:
+    raise Exception('Lazy and eager results differ.')
+  report = data.memory()
+  print(f'  eager {eager_time * 1000:9.1f} ms  {report["eager"] / 1024 / 1024:8.1f} MB')
+  print(f'  lazy  {lazy_time * 1000:9.1f} ms  {report["lazy"] / 1024 / 1024:8.1f} MB'
+        f'  (raw {report["raw"] / 1024 / 1024:.1f} MB + projection {report["projection"] / 1024 / 1024:.1f} MB)')
+  print(f'  saved {report["saved"] / 1024 / 1024:.1f} MB ({report["saved"] / report["eager"] * 100:.0f}%)')
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Benchmark lazy attribute decoding of APIC responses.')
+  parser.add_argument('payloads', nargs='*', help='recorded APIC JSON responses')
+  parser.add_argument('--objects', type=int, default=100000, help='objects in the synthetic payload')
+  parser.add_argument('--fields', default='name,nameAlias,descr,dn', help='comma separated attributes to read')
+  args = parser.parse_args()
+  fields = args.fields.split(',')
+  if len(args.payloads) == 0:
+    run(f'synthetic fvCEp x {args.objects}', synthetic_payload(args.objects), fields)
+  for filename in args.payloads:
+    with open(filename, 'rb') as f:
+      run(filename, f.read(), fields)
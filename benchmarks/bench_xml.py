@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark of data.xml_to_json on mo.xml style payloads.
+Compares the event based parser with the previous string slicing parser (reproduced below), which is
+quadratic in the size of the XML.  The previous parser is only run on payloads up to --previous-limit MB.
+Pass recorded XML responses or config files as arguments, or run without arguments for synthetic payloads.
+
+  python benchmarks/bench_xml.py [--sizes 0.25,1,4] [--previous-limit 1] [--repeat 3] [payload.xml ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data import xml_to_json
+
+
+# Previous implementation of xml_to_json, kept for comparison
+def previous_split_unquoted(source_string, split_char):
+  return_value = []
+  pos = source_string.find(split_char)
+  while pos >= 0:
+    if source_string[:pos].count('\"') % 2 == 1:
+      pos = source_string.find(split_char, pos+1)
+    else:
+      return_value.append(source_string[:pos])
+      source_string = source_string[pos+1:]
+      pos = source_string.find(split_char)
+  return_value.append(source_string)
+  return return_value
+
+
+def previous_xml_item(xml):
+  xml = xml.strip()
+  item = xml[:xml.find('>')+1]
+  if item[-2] != "/":
+    key = item[1:item.find(' ')]
+    item = xml[:xml.find(f'</{key}>')+len(f'<{key}>')+1]
+  return item
+
+
+def previous_xml_entry_to_json(xml):
+  xml = xml[1:-2]if xml[-2:] == "/>" else xml[1:-1]
+  parts = previous_split_unquoted(xml, " ")
+  js = {parts[0]: {'attributes': {}}}
+  for o in parts[1:]:
+    js[parts[0]]['attributes'][o[:o.find('=')]] = o[o.find('=')+1:][1:-1]
+  return js
+
+
+def previous_xml_to_json(xml):
+  if xml[:5] == '<?xml':
+    xml = xml[xml.find('?>')+2:]
+  if 'imdata' in xml[:8]:
+    body = xml[xml[1:].find('<')+1:xml[:-1].rfind('>')+1]
+    total_count = xml[xml.find('=')+2:xml.find('\">')]
+    return {'totalCount': str(total_count), 'imdata': previous_xml_to_json(body)}
+  rv = []
+  while len(xml) > 0:
+    item = previous_xml_item(xml)
+    xml = xml[len(item):].strip()
+    if item.find('>') < len(item) -1:
+      hdr = item[:item.find('>')+1]
+      body = item[len(hdr):item.find(f'</{hdr[1:hdr.find(" ")]}>')]
+      js = previous_xml_entry_to_json(hdr)
+      js[list(js.keys())[0]]['children'] = previous_xml_to_json(body)
+    else:
+      js = previous_xml_entry_to_json(item)
+    rv.append(js)
+  return rv if len(rv) > 1 else rv[0]
+
+
+# Synthetic imdata response of tenants, each with BDs holding subnets, of about size_mb megabytes
+def synthetic_payload(size_mb):
+  tenants = []
+  size = 0
+  i = 0
+  while size < size_mb * 1024 * 1024:
+    bds = ''.join(f'<fvBD name="bd{b}" descr="bd {b} of tenant {i}" arpFlood="yes" unicastRoute="yes">'
+                  f'<fvRsCtx tnFvCtxName="vrf{b % 4}"/><fvSubnet ip="10.{i % 256}.{b}.1/24" scope="private"/></fvBD>'
+                  for b in range(20))
+    tenant = f'<fvTenant dn="uni/tn-tenant{i}" name="tenant{i}" descr="tenant {i}" nameAlias="">{bds}</fvTenant>'
+    tenants.append(tenant)
+    size += len(tenant)
+    i += 1
+  return f'<?xml version="1.0" encoding="UTF-8"?><imdata totalCount="{i}">{"".join(tenants)}</imdata>'
+
+
+def best_time(function, content, repeat):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function(content)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None or elapsed < best else best
+  return best
+
+
+def run(name, content, repeat, previous_limit):
+  size_mb = len(content) / 1024 / 1024
+  current = best_time(xml_to_json, content, repeat)
+  line = f'{name:28} {size_mb:6.2f} MB  event parser {current * 1000:9.1f} ms'
+  if size_mb <= previous_limit:
+    previous = best_time(previous_xml_to_json, content, 1)
+    line += f'  previous {previous * 1000:10.1f} ms  {previous / current:7.1f}x'
+  print(line)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Benchmark XML to JSON conversion.')
+  parser.add_argument('payloads', nargs='*', help='recorded APIC XML responses or XML config files')
+  parser.add_argument('--sizes', default='0.25,0.5,1,4', help='comma separated synthetic payload sizes in MB')
+  parser.add_argument('--previous-limit', type=float, default=1, help='largest payload (MB) run with the previous parser')
+  parser.add_argument('--repeat', type=int, default=3, help='runs of the event parser; the best time is reported')
+  args = parser.parse_args()
+  if len(args.payloads) == 0:
+    for size in args.sizes.split(','):
+      run(f'synthetic {size} MB', synthetic_payload(float(size)), args.repeat, args.previous_limit)
+  for filename in args.payloads:
+    with open(filename) as f:
+      run(filename, f.read(), args.repeat, args.previous_limit)
@@ -0,0 +1,245 @@
+import threading    # threading module for the lock guarding cache entries
+import time         # time module for entry expiry
+from collections import OrderedDict
+
+
+# Extracts the (class, dn) pairs of every object in a post payload, including children.
+# Children without a dn or rn only contribute their class.
+def payload_objects(payload, parent_dn=None):
+  objects = []
+  if type(payload) is list:
+    for o in payload:
+      objects += payload_objects(o, parent_dn)
+    return objects
+  if type(payload) is not dict:
+    return objects
+  if 'imdata' in payload:
+    return payload_objects(payload['imdata'], parent_dn)
+  for cls in payload:
+    body = payload[cls]
+    if type(body) is not dict:
+      continue
+    attributes = body.get('attributes', {})
+    dn = attributes.get('dn')
+    if dn is None and 'rn' in attributes and parent_dn is not None:
+      dn = f'{parent_dn}/{attributes["rn"]}'
+    objects.append((cls, dn))
+    objects += payload_objects(body.get('children', []), dn if dn is not None else parent_dn)
+  return objects
+
+
+# True if one dn is the same as, or an ancestor of, the other
+def dn_related(dn1, dn2):
+  return dn1 == dn2 or dn1.startswith(dn2 + '/') or dn2.startswith(dn1 + '/')
+
+
+# dn of an mo/ path, e.g. mo/uni/tn-common.json -> uni/tn-common
+def path_dn(path):
+  path = path.lstrip('/')
+  if path[:3] == 'mo/':
+    path = path[3:]
+  for ext in ['.json', '.xml']:
+    if path.endswith(ext):
+      return path[:-len(ext)]
+  return path
+
+
+# Applies one pushed subscription event to a cached class or mo query result.  The top level dict and imdata
+# list of content are changed in place; changed objects are replaced, never modified, as results handed out by
+# the cache share them (see Cache.apply).
+# Returns False if the event can not be applied and the result must be fetched again.
+def apply_event(content, mo):
+  if type(content) is not dict or 'imdata' not in content:
+    return False
+  cls = list(mo)[0]
+  attributes = dict(mo[cls].get('attributes', {}))
+  status = attributes.pop('status', '') or 'modified'
+  attributes.pop('childAction', None)
+  dn = attributes.get('dn')
+  if dn is None:
+    return False
+  imdata = content['imdata']
+  for i, o in enumerate(imdata):
+    key = list(o)[0]
+    if o[key].get('attributes', {}).get('dn') == dn:
+      if status == 'deleted':
+        imdata.pop(i)
+        content['totalCount'] = str(int(content.get('totalCount', len(imdata) + 1)) - 1)
+      else:
+        imdata[i] = {key: dict(o[key], attributes=dict(o[key].get('attributes', {}), **attributes))}
+      return True
+  if status == 'deleted':
+    return True
+  if status == 'created':
+    imdata.append({cls: {'attributes': attributes}})
+    content['totalCount'] = str(int(content.get('totalCount', len(imdata) - 1)) + 1)
+    return True
+  return False
+
+
+# Result cache for Node.get, keyed on the normalized (path, parameters) pair.
+# Cached results are shared, not copied: every hit returns the stored object, which must be treated as read-only
+# by the caller (and by whoever stored it).  Subscription events replace the stored result instead of changing it,
+# so a result already handed out stays as it was.
+#  ttl - default number of seconds an entry is valid
+#  class_ttl - dictionary of per-class ttl values, e.g. {'fabricNode': 300, 'faultInst': 5}
+#  max_size - memory bound in bytes (measured as response size).  Least recently used entries are evicted first.
+class Cache(object):
+  def __init__(self, ttl=30, class_ttl=None, max_size=64 * 1024 * 1024):
+    self.__entries = OrderedDict()
+    self.__subscriptions = {}
+    self.__lock = threading.RLock()
+    self.__size = 0
+    self.__generation = 0
+    self.ttl = ttl
+    self.class_ttl = dict(class_ttl) if class_ttl is not None else {}
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  # A copied node gets its own, empty, cache with the same settings
+  def __deepcopy__(self, memo):
+    return Cache(self.ttl, self.class_ttl, self.max_size)
+
+  @property
+  def size(self):
+    return self.__size
+
+  # Incremented on every invalidation.  A result fetched before an invalidation is not stored.
+  @property
+  def generation(self):
+    return self.__generation
+
+  @property
+  def stats(self):
+    with self.__lock:
+      return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+              'entries': len(self.__entries), 'size': self.__size}
+
+  # Normalized cache key for a path and its parameters
+  @staticmethod
+  def key(path, parameters=None):
+    path = path.lstrip('/')
+    if not parameters:
+      return path, ()
+    return path, tuple(sorted((str(k), str(v)) for k, v in parameters.items()))
+
+  # Classes an entry may contain: the queried class plus any target or response subtree classes
+  @staticmethod
+  def classes(path, parameters=None):
+    classes = set()
+    path = path.lstrip('/')
+    if path[:6] == 'class/':
+      classes.add(path[6:path.rfind('.')] if '.' in path else path[6:])
+    parameters = parameters if parameters else {}
+    for parameter in ['target-subtree-class', 'rsp-subtree-class']:
+      if parameter in parameters:
+        classes.update(c.strip() for c in str(parameters[parameter]).split(','))
+    return classes
+
+  def entry_ttl(self, path, parameters=None):
+    ttls = [self.class_ttl[c] for c in self.classes(path, parameters) if c in self.class_ttl]
+    return min(ttls) if len(ttls) > 0 else self.ttl
+
+  # Returns the cached (read-only) result, or None if there is no valid entry
+  def get(self, path, parameters=None):
+    key = self.key(path, parameters)
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry is not None and entry['expires'] < time.monotonic():
+        self.__remove(key)
+        entry = None
+      if entry is None:
+        self.misses += 1
+        return None
+      self.__entries.move_to_end(key)
+      self.hits += 1
+      return entry['value']
+
+  # Stores a result.  The value is kept as is, so it must not be modified once stored.
+  #  generation - the cache generation read before the result was requested
+  #  subscription - APIC subscription id keeping the result current.  Subscribed entries do not expire.
+  # Returns boolean indicating if the result was stored
+  def put(self, path, parameters, value, size=0, generation=None, subscription=None):
+    ttl = self.entry_ttl(path, parameters)
+    if ttl <= 0 or size > self.max_size or (generation is not None and generation != self.__generation):
+      return False
+    key = self.key(path, parameters)
+    expires = float('inf') if subscription is not None else time.monotonic() + ttl
+    entry = {'value': value, 'expires': expires, 'size': size, 'subscription': subscription,
+             'path': key[0], 'parameters': dict(key[1]), 'classes': self.classes(path, parameters)}
+    with self.__lock:
+      if key in self.__entries:
+        self.__remove(key)
+      self.__entries[key] = entry
+      self.__size += size
+      if subscription is not None:
+        self.__subscriptions[str(subscription)] = key
+      while self.__size > self.max_size and len(self.__entries) > 0:
+        self.__remove(next(iter(self.__entries)))
+        self.evictions += 1
+    return True
+
+  def __remove(self, key):
+    entry = self.__entries.pop(key)
+    self.__size -= entry['size']
+    if entry['subscription'] is not None:
+      self.__subscriptions.pop(str(entry['subscription']), None)
+
+  # Subscription callback.  Applies pushed objects to a copy of the subscribed result, which replaces it.
+  #  imdata of None means the subscription was lost and the entry is removed.
+  # Returns False if no entry holds the subscription any longer.
+  def apply(self, subscription_id, imdata):
+    with self.__lock:
+      key = self.__subscriptions.get(str(subscription_id))
+      if key is None:
+        return False
+      entry = self.__entries[key]
+      if imdata is None:
+        self.__remove(key)
+        return False
+      value = entry['value']
+      if type(value) is dict and type(value.get('imdata')) is list:
+        value = dict(value, imdata=list(value['imdata']))
+      for mo in imdata:
+        if entry['parameters'].get('rsp-subtree', 'no') != 'no' or 'query-target-filter' in entry['parameters']:
+          applied = False
+        else:
+          applied = apply_event(value, mo)
+        if not applied:
+          self.__remove(key)
+          return False
+      entry['value'] = value
+      return True
+
+  # Removes entries that may contain an object of the given class or dn.
+  #  Class queries for cls, mo queries for dn or any of its ancestors/descendants,
+  #  and class queries returning subtrees (which may hold the object as a child) are removed.
+  def invalidate(self, cls=None, dn=None):
+    with self.__lock:
+      self.__generation += 1
+      for key in list(self.__entries):
+        entry = self.__entries[key]
+        if cls is not None and cls in entry['classes']:
+          self.__remove(key)
+        elif entry['path'][:3] == 'mo/':
+          if dn is not None and dn_related(path_dn(entry['path']), dn):
+            self.__remove(key)
+        elif entry['parameters'].get('rsp-subtree', 'no') != 'no':
+          self.__remove(key)
+
+  # Removes entries that may be affected by a post of the given payload
+  def invalidate_payload(self, payload):
+    if type(payload) is str:
+      self.clear()
+      return
+    for cls, dn in payload_objects(payload):
+      self.invalidate(cls, dn)
+
+  def clear(self):
+    with self.__lock:
+      self.__generation += 1
+      self.__entries.clear()
+      self.__subscriptions.clear()
+      self.__size = 0
@@ -1,116 +1,273 @@
 import json
+import io
+import gzip
+import sys      # sys module for object sizes in the memory report
+import decoder  # decoder module for JSON parsing of raw response bodies
+import records  # records module for the compact record types of ACI classes
+import filters  # filters module to evaluate query-target-filter expressions locally
+from collections import Counter
+from xml.parsers import expat   # expat module for event based XML parsing
+from xml.sax.saxutils import escape
 
 
-def json_to_xml(js, key=None, indent=0):
+# Escape an attribute value for a single quoted XML attribute
+def xml_attribute(value):
+  return escape(str(value), {"'": '&apos;'})
+
+
+# Write JSON data as XML to a file-like object.  Each element is written as it is reached, so the cost is
+# linear in the size of the output and the full XML string is never built in memory.
+def write_xml(js, fp, key=None, indent=0):
   if key is None:
     if type(js) is list:
-      rv = ''
       for o in js:
-        key = list(o.keys())[0]
-        rv += json_to_xml(o[key], key)
-      return rv
+        key = next(iter(o))
+        write_xml(o[key], fp, key)
+      return
     elif 'imdata' in js:
       key = 'imdata'
     else:
-      key = list(js.keys())[0]
+      key = next(iter(js))
       js = js[key]
   if key == 'imdata' and 'totalCount' in js:
-    atts = f' totalCount="{js["totalCount"]}"'
-    sub = ''
+    fp.write(f'<{key} totalCount="{xml_attribute(js["totalCount"])}">\n')
     for o in js['imdata']:
-      subkey = str(list(o.keys())[0])
-      sub += json_to_xml(o[subkey], subkey, indent + 2)
-    return f'<{key}{atts}>\n{sub}</{key}>\n'
+      subkey = next(iter(o))
+      write_xml(o[subkey], fp, subkey, indent + 2)
+    fp.write(f'</{key}>\n')
   elif 'attributes' in js:
-    atts = ''
-    for att in js['attributes'].keys():
-      atts += f" {att}='{js['attributes'][att]}'"
+    atts = ''.join(f" {att}='{xml_attribute(val)}'" for att, val in js['attributes'].items())
     if 'children' in js:
-      sub = ''
+      fp.write(' ' * indent + f'<{key}{atts}>\n')
       for o in js['children']:
-        subkey = str(list(o.keys())[0])
-        sub += json_to_xml(o[subkey], subkey, indent + 2)
-      return ' ' * indent + f'<{key}{atts}>\n{sub}</{key}>\n'
+        subkey = next(iter(o))
+        write_xml(o[subkey], fp, subkey, indent + 2)
+      fp.write(f'</{key}>\n')
     else:
-      return ' ' * indent + f'<{key}{atts}/>\n'
+      fp.write(' ' * indent + f'<{key}{atts}/>\n')
   else:
-    print('fault')
+    raise Exception(f'Unable to convert {key} to xml.  Object has no attributes.')
 
 
-# split string into a list at each occurrence of split_char ignoring an occurrence of the split_char within a quotes.
-def split_unquoted(source_string, split_char):
-  return_value = []
-  pos = source_string.find(split_char)
-  while pos >= 0:
-    if source_string[:pos].count('\"') % 2 == 1:
-      pos = source_string.find(split_char, pos+1)
-    else:
-      return_value.append(source_string[:pos])
-      source_string = source_string[pos+1:]
-      pos = source_string.find(split_char)
-  return_value.append(source_string)
-  return return_value
-
-
-# Pulls the first full XML entry, including all children, from an xml string.
-def xml_item(xml):
-  xml = xml.strip()
-  if not xml[:1] == '<':
-    raise Exception(f'Invalid Character found in xml string, "{xml}".  XML should start with "<"')
-  item = xml[:xml.find('>')+1]
-  if item[-2] != "/":
-    key = item[1:item.find(' ')]
-    item = xml[:xml.find(f'</{key}>')+len(f'<{key}>')+1]
-  return item
-
-
-# convert XML entry to json
-def xml_entry_to_json(xml):
-  xml = xml[1:-2]if xml[-2:] == "/>" else xml[1:-1]
-  parts = split_unquoted(xml, " ")
-  js = {parts[0]: {'attributes': {}}}
-  for o in parts[1:]:
-    js[parts[0]]['attributes'][o[:o.find('=')]] = o[o.find('=')+1:][1:-1]
-  return js
+def json_to_xml(js, key=None, indent=0):
+  fp = io.StringIO()
+  write_xml(js, fp, key, indent)
+  return fp.getvalue()
+
+
+# Name of the element wrapping the input, so XML with several top level elements parses as one document
+XML_WRAPPER = 'aciXmlToJsonRoot'
 
 
 # convert XML to JSON
-def xml_to_json(xml):
-  if xml[:5] == '<?xml':
-    xml = xml[xml.find('?>')+2:]
-  if 'imdata' in xml[:8]:
-    body = xml[xml[1:].find('<')+1:xml[:-1].rfind('>')+1]
-    total_count = xml[xml.find('=')+2:xml.find('\">')]
-    return {'totalCount': str(total_count), 'imdata': xml_to_json(body)}
-  rv = []
-  while len(xml) > 0:
-    item = xml_item(xml)
-    xml = xml[len(item):].strip()
-    if item.find('>') < len(item) -1:
-      hdr = item[:item.find('>')+1]
-      body = item[len(hdr):item.find(f'</{hdr[1:hdr.find(" ")]}>')]
-      js = xml_entry_to_json(hdr)
-      js[list(js.keys())[0]]['children'] = xml_to_json(body)
-    else:
-      js = xml_entry_to_json(item)
-    rv.append(js)
-  return rv if len(rv) > 1 else rv[0]
+# Event based (expat) conversion to the APIC JSON structure in a single pass over the XML.
+#  xml - XML string/bytes, or a file-like object, which is read in chunks
+# An imdata document returns {'totalCount': ..., 'imdata': [...]}.  Otherwise a single top level object
+# is returned as a dict and several as a list.  children are always lists, as in APIC JSON.
+def xml_to_json(xml, chunk_size=1024 * 1024):
+  root = {}
+  stack = [root]
+
+  def start(name, attributes):
+    o = {name: {'attributes': attributes}}
+    stack[-1].setdefault('children', []).append(o)
+    stack.append(o[name])
+
+  def end(name):
+    stack.pop()
+
+  parser = expat.ParserCreate()
+  parser.StartElementHandler = start
+  parser.EndElementHandler = end
+  parser.Parse(f'<{XML_WRAPPER}>', False)
+  first = True
+  for chunk in xml_chunks(xml, chunk_size):
+    if first:
+      chunk = strip_xml_declaration(chunk)
+      first = False
+    parser.Parse(chunk, False)
+  parser.Parse(f'</{XML_WRAPPER}>', True)
+  rv = root['children'][0][XML_WRAPPER].get('children', [])
+  if len(rv) == 1 and 'imdata' in rv[0]:
+    imdata = rv[0]['imdata']
+    return {'totalCount': str(imdata['attributes'].get('totalCount', len(imdata.get('children', [])))),
+            'imdata': imdata.get('children', [])}
+  return rv if len(rv) != 1 else rv[0]
+
+
+def xml_chunks(xml, chunk_size):
+  if type(xml) in [str, bytes]:
+    yield xml
+    return
+  while True:
+    chunk = xml.read(chunk_size)
+    if not chunk:
+      return
+    yield chunk
+
+
+# Removes a leading <?xml ...?> declaration, which may only appear at the start of a document
+def strip_xml_declaration(xml):
+  marker = '<?xml' if type(xml) is str else b'<?xml'
+  end = '?>' if type(xml) is str else b'?>'
+  stripped = xml.lstrip()
+  if stripped[:5] == marker:
+    return stripped[stripped.find(end) + 2:]
+  return xml
+
+
+# Parses a JSON response body keeping only the listed attributes of each object, at any depth.
+# The objects of imdata are decoded one at a time (see decoder.iter_body) and projected as they are decoded, so
+# the peak memory is the body, the projection and one full object.  A body without imdata is decoded whole.
+def project(content, attributes):
+  fields = frozenset(attributes)
+  header = {}
+  imdata = [project_object(o, fields) for o in decoder.iter_body(content, header)]
+  if header.get('imdata'):
+    total_count = header.get('totalCount')
+    return {'totalCount': str(total_count if total_count is not None else len(imdata)), 'imdata': imdata}
+  return project_object(decoder.loads(content), fields)
+
+
+# Replaces each attributes dict in a decoded object, at any depth, by its projection on fields
+def project_object(content, fields):
+  stack = [content]
+  while len(stack) > 0:
+    o = stack.pop()
+    if type(o) is list:
+      stack.extend(o)
+    elif type(o) is dict:
+      for key, value in o.items():
+        if key == 'attributes' and type(value) is dict:
+          o[key] = {att: val for att, val in value.items() if att in fields}
+        elif type(value) in [dict, list]:
+          stack.append(value)
+  return content
+
+
+# Approximate memory used by a decoded JSON structure (objects shared by reference are counted once)
+def deep_size(o):
+  seen = set()
+  size = 0
+  stack = [o]
+  while len(stack) > 0:
+    o = stack.pop()
+    if id(o) in seen:
+      continue
+    seen.add(id(o))
+    size += sys.getsizeof(o)
+    if type(o) is dict:
+      stack.extend(o.keys())
+      stack.extend(o.values())
+    elif type(o) is list:
+      stack.extend(o)
+  return size
+
+
+# Attributes exported as typed columns by Data.to_arrow.  Integer attributes are listed by name; statistics
+# counters (e.g. unicastCum, unicastRate of eqptIngrBytes5min) are recognised by suffix and exported as floats.
+# Columns holding values that do not convert (e.g. pcTag "any") are exported as strings.
+INTEGER_ATTRIBUTES = {'pcTag', 'sPcTag', 'dPcTag', 'srcEpgPcTag', 'dstEpgPcTag', 'pktLen', 'srcPort', 'dstPort',
+                      'occur', 'id', 'podId', 'vnid', 'seg', 'scope', 'prio', 'mtu', 'speed', 'cnt', 'count'}
+COUNTER_SUFFIXES = ('Cum', 'Per', 'Min', 'Max', 'Avg', 'Last', 'Rate', 'Spct', 'Ttl', 'Thr', 'Tr', 'Base')
+
+
+# Arrow array of an attribute column, typed when the attribute is numeric
+def arrow_column(pa, attribute, values):
+  array = pa.array(values, type=pa.string())
+  if attribute in INTEGER_ATTRIBUTES:
+    numeric = pa.int64()
+  elif attribute.endswith(COUNTER_SUFFIXES):
+    numeric = pa.float64()
+  else:
+    return array
+  try:
+    return array.cast(numeric)
+  except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+    return array
 
 
 class Data(object):
-  def __init__(self, content):
+  # content - decoded JSON, or a JSON/XML string or bytes
+  # lazy - keep a JSON string/bytes undecoded.  Column accessors (column, attribute, value, sum) then decode
+  #        only the attributes they are asked for, and the full content is decoded on first access.
+  def __init__(self, content, lazy=False):
+    self.__raw = None
+    self.__fields = set()
+    self.__projection = None
+    if type(content) is bytes:
+      content = content.strip()
+      if content[:1] == b'<':
+        content = content.decode('utf-8')
+      elif lazy:
+        self.__raw = content
+        content = None
+      else:
+        content = decoder.loads(content)
     if type(content) is str:
       content = content.strip()
       if content[0] == '<':
         content = xml_to_json(content)
+      elif lazy:
+        self.__raw = content
+        content = None
       else:
-        content = json.loads(content)
+        content = decoder.loads(content)
     self.__content = content
+    self.__columns = None
+    self.__rows = None
+    self.__dns = None
+    self.__classes = None
+    self.__children = None
 
   @property
   def content(self):
+    if self.__content is None and self.__raw is not None:
+      self.__content = decoder.loads(self.__raw)
+      self.__raw = None
+      self.__projection = None
+      self.__fields = set()
+      self.__columns = None
+      self.__rows = None
     return self.__content
 
+  # True while the full content has not been decoded
+  @property
+  def lazy(self):
+    return self.__raw is not None
+
+  # Attributes decoded so far in lazy mode
+  @property
+  def fields(self):
+    return set(self.__fields)
+
+  # Content read by the counts and columns: the full content once decoded, otherwise the projection of the
+  # attributes requested so far.  Requesting attributes outside the projection projects the body again on all of
+  # them, so memory stays bounded by the attributes in use.  Request the attributes needed together (e.g.
+  # attribute([...])) to project the body once.
+  def __view(self, attributes=()):
+    if self.__raw is None:
+      return self.content
+    missing = set(attributes) - self.__fields
+    if self.__projection is not None and len(missing) == 0:
+      return self.__projection
+    self.__fields |= missing
+    self.__projection = project(self.__raw, self.__fields)
+    self.__columns = None
+    self.__rows = None
+    return self.__projection
+
+  # Memory report in bytes.  For lazy data: the raw body, the projection decoded so far, and the fully
+  # decoded content (decoded for the report, then discarded), with the saving of the lazy mode.
+  def memory(self):
+    if self.__raw is None:
+      return {'eager': deep_size(self.content)}
+    raw = sys.getsizeof(self.__raw)
+    projection = deep_size(self.__projection) if self.__projection is not None else 0
+    eager = deep_size(decoder.loads(self.__raw))
+    return {'raw': raw, 'projection': projection, 'lazy': raw + projection, 'eager': eager,
+            'saved': eager - raw - projection, 'fields': sorted(self.__fields)}
+
   @property
   def json(self):
     return self.imdata
@@ -121,47 +278,220 @@ class Data(object):
 
   @property
   def imdata(self):
-    if type(self.content) is dict:
-      if 'imdata' in self.content:
-        return self.content['imdata']
-      return [self.content]
-    return self.content
+    return self.__imdata(self.content)
+
+  @staticmethod
+  def __imdata(content):
+    if type(content) is dict:
+      if 'imdata' in content:
+        return content['imdata']
+      return [content]
+    return content
 
   @property
   def count(self):
-    if type(self.content) is dict:
-      if 'totalCount' in self.content:
-        return int(self.content['totalCount'])
+    content = self.__view()
+    if type(content) is dict:
+      if 'totalCount' in content:
+        return int(content['totalCount'])
       else:
         return 1
-    elif type(self.content) is list:
-      return len(self.content)
+    elif type(content) is list:
+      return len(content)
+
+  # Columnar view of the top level objects: {class: {attribute: [values]}}
+  # Built in a single pass on first access.  Objects missing an attribute of their class hold None.
+  # For lazy data only the attributes decoded so far are included.
+  @property
+  def columns(self):
+    if self.__columns is None:
+      self.__build_columns()
+    return self.__columns
+
+  # (class, index in class columns) of each top level object, in imdata order
+  @property
+  def rows(self):
+    if self.__rows is None:
+      self.__build_columns()
+    return self.__rows
+
+  def __build_columns(self):
+    columns = {}
+    rows = []
+    counts = {}
+    for o in self.__imdata(self.__view()):
+      cls = next(iter(o))
+      attributes = o[cls].get('attributes', {})
+      table = columns.get(cls)
+      if table is None:
+        table = columns[cls] = {}
+        counts[cls] = 0
+      n = counts[cls]
+      for att, val in attributes.items():
+        column = table.get(att)
+        if column is None:
+          column = table[att] = [None] * n
+        column.append(val)
+      if len(attributes) != len(table):
+        for column in table.values():
+          if len(column) == n:
+            column.append(None)
+      rows.append((cls, n))
+      counts[cls] = n + 1
+    self.__columns = columns
+    self.__rows = rows
+
+  # Column of an attribute across all top level objects, in imdata order
+  def column(self, attribute):
+    self.__view([attribute])
+    columns = self.columns
+    if len(columns) == 1:
+      return next(iter(columns.values()))[attribute]
+    return [columns[cls][attribute][i] for cls, i in self.rows]
+
+  # Compact records (see records.py) of the top level objects of class cls, in imdata order.
+  # Built from the columnar view, so lazy data only decodes the attributes of the record.
+  #  cls - ACI class.  Defaults to the class of the objects when the result holds a single class.
+  #  attributes - attributes of the record.  Defaults to the records.SCHEMA entry of the class.
+  def records(self, cls=None, attributes=None):
+    if cls is None:
+      classes = list(self.columns)
+      if len(classes) == 0:
+        return []
+      if len(classes) > 1:
+        raise Exception(f'Result holds several classes ({", ".join(classes)}).  Select the class of the records.')
+      cls = classes[0]
+    record_type = records.record_type(cls, attributes)
+    self.__view(record_type.attributes)
+    table = self.columns.get(cls)
+    if table is None:
+      return []
+    count = sum(1 for row_cls, _ in self.rows if row_cls == cls)
+    missing = [None] * count
+    return list(map(record_type._make, zip(*[table.get(att, missing) for att in record_type.attributes])))
+
+  # Arrow table of the top level objects, built from the columnar view.  Requires pyarrow.
+  #  columns - attributes to export (default: all attributes of the selected objects)
+  #  cls - only export objects of this class.  Results holding several classes get a leading "class" column.
+  def to_arrow(self, columns=None, cls=None):
+    try:
+      import pyarrow as pa
+    except ImportError:
+      raise Exception('Arrow export requires pyarrow.  Install it with "pip install pyarrow".')
+    if columns is not None:
+      self.__view(columns)
+    elif self.lazy:
+      self.content
+    tables = self.columns
+    if cls is not None or len(tables) == 1:
+      cls = cls if cls is not None else next(iter(tables))
+      table = tables.get(cls, {})
+      count = sum(1 for row_cls, _ in self.rows if row_cls == cls)
+      names = list(columns) if columns is not None else list(table)
+      missing = [None] * count
+      arrays = [arrow_column(pa, name, table.get(name, missing)) for name in names]
+      return pa.Table.from_arrays(arrays, names=names)
+    if columns is not None:
+      names = list(columns)
+    else:
+      names = list(dict.fromkeys(att for table in tables.values() for att in table))
+    arrays = [pa.array([row_cls for row_cls, _ in self.rows], type=pa.string())]
+    for name in names:
+      values = [tables[row_cls][name][i] if name in tables[row_cls] else None for row_cls, i in self.rows]
+      arrays.append(arrow_column(pa, name, values))
+    return pa.Table.from_arrays(arrays, names=['class'] + names)
+
+  # Writes the Arrow table of the objects (see to_arrow) to a Parquet file.  Requires pyarrow.
+  def to_parquet(self, path, columns=None, cls=None, compression='zstd'):
+    table = self.to_arrow(columns, cls)
+    import pyarrow.parquet as pq
+    pq.write_table(table, path, compression=compression)
+
+  # Splits the top level objects by class into a Data per class, e.g. the result of a multi-class batch query.
+  #  classes - classes to return, each with a Data (empty if there are no objects of the class).
+  #            Defaults to the classes present.
+  def split(self, classes=None):
+    groups = {cls: [] for cls in classes} if classes is not None else {}
+    for o in self.imdata:
+      cls = next(iter(o))
+      if cls in groups:
+        groups[cls].append(o)
+      elif classes is None:
+        groups[cls] = [o]
+    return {cls: Data({'totalCount': str(len(objects)), 'imdata': objects}) for cls, objects in groups.items()}
+
+  # New Data holding the top level objects matching a query-target-filter expression, evaluated locally
+  def filter(self, expression):
+    return Data(filters.narrow({'imdata': self.imdata}, expression))
+
+  # Builds the dn, class, and parent/child indexes over all objects, including nested children.
+  # Children without a dn attribute get their dn from the parent dn and their rn.
+  def __build_index(self):
+    dns = {}
+    classes = {}
+    children = {}
+    stack = [(o, None) for o in reversed(self.imdata)]
+    while len(stack) > 0:
+      o, parent_dn = stack.pop()
+      cls = next(iter(o))
+      body = o[cls]
+      attributes = body.get('attributes', {})
+      dn = attributes.get('dn')
+      if dn is None and parent_dn is not None and 'rn' in attributes:
+        dn = f'{parent_dn}/{attributes["rn"]}'
+      if dn is not None:
+        dns[dn] = o
+      classes.setdefault(cls, []).append(o)
+      if parent_dn is not None:
+        children.setdefault(parent_dn, {}).setdefault(cls, []).append(o)
+      for child in reversed(body.get('children', [])):
+        stack.append((child, dn))
+    self.__dns = dns
+    self.__classes = classes
+    self.__children = children
+
+  # Object with the given dn, at any depth of the response, or None
+  def by_dn(self, dn):
+    if self.__dns is None:
+      self.__build_index()
+    return self.__dns.get(dn)
+
+  # Direct children of the object with the given dn, optionally only those of class cls
+  def children_of(self, dn, cls=None):
+    if self.__children is None:
+      self.__build_index()
+    children = self.__children.get(dn, {})
+    if cls is not None:
+      return list(children.get(cls, []))
+    return [o for objects in children.values() for o in objects]
+
+  # All objects of class cls at any depth of the response
+  def descendants(self, cls):
+    if self.__classes is None:
+      self.__build_index()
+    return list(self.__classes.get(cls, []))
 
   def attribute(self, attribute, keys=False):
     if type(attribute) is str:
-      return [o[list(o)[0]]['attributes'][attribute] for o in self.imdata]
+      return list(self.column(attribute))
     elif type(attribute) is list:
-      lst = []
-      for o in self.imdata:
-        if keys:
-          sub = {a: o[list(o.keys())[0]]['attributes'][a] for a in attribute}
-        else:
-          sub = [o[list(o.keys())[0]]['attributes'][a] for a in attribute]
-        lst.append(sub)
-      return lst
+      self.__view(attribute)
+      values = zip(*[self.column(a) for a in attribute])
+      if keys:
+        return [dict(zip(attribute, v)) for v in values]
+      return [list(v) for v in values]
     else:
       raise Exception('Invalid attribute type.  Must be String or List.')
 
   def value(self, attribute):
-    value = self.attribute(attribute)
-    if len(value) == 0:
+    self.__view([attribute])
+    if len(self.rows) == 0:
       return None
-    return value[0]
+    cls, i = self.rows[0]
+    return self.columns[cls][attribute][i]
 
   def sum(self, attribute, printout=False, minimum=0):
-    ret = {}
-    for val in self.attribute(attribute):
-      ret[val] = ret[val]+1 if val in ret else 0
+    ret = dict(Counter(self.column(attribute)))
     for val in list(ret.keys()):
       if ret[val] < minimum:
         _ = ret.pop(val)
@@ -191,24 +521,26 @@ class Data(object):
     else:
       print(self.content)
 
-  def save(self, filename, index=None, style='json'):
+  # Save the data (or the object at index) to a file as json or xml.  Output is streamed to the file.
+  #  compress - gzip the output.  None compresses when the filename ends in .gz
+  #  compact - write json without indentation or spaces
+  def save(self, filename, index=None, style='json', compress=None, compact=False):
     if index is None and self.count == 1:
       index = 0
-    else:
+    elif index is not None:
       if type(index) is not int:
         raise Exception('Invalid index.  Must be an integer value')
       if not 0 <= index < self.count:
         raise Exception('Invalid index.  Out of bounds of output array.')
-    if style == 'xml':
-      if index is None:
-        out = self.xml
+    if compress is None:
+      compress = filename[-3:] == '.gz'
+    file = gzip.open(filename, 'wt', encoding='utf-8') if compress else open(filename, 'w', encoding='utf-8')
+    with file:
+      if style == 'xml':
+        write_xml(self.content if index is None else self.imdata[index], file)
       else:
-        out = self.json_to_xml(self.imdata[index])
-    else:
-      if index is None:
-        out = json.dumps(self.imdata, indent=2)
-      else:
-        out = json.dumps(self.imdata[index], indent=2)
-    file = open(filename, 'w')
-    file.write(out)
-    file.close()
+        out = self.imdata if index is None else self.imdata[index]
+        if compact:
+          json.dump(out, file, separators=(',', ':'))
+        else:
+          json.dump(out, file, indent=2)
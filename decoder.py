@@ -0,0 +1,240 @@
+import json      # JSON module, the fallback decoder and incremental object decoder
+import codecs    # codecs module for incremental utf-8 decoding of streamed chunks
+import re        # re module to locate imdata and totalCount in a streamed body
+
+# Optional fast JSON decoders.  Each parses bytes directly, without first decoding the body to str.
+try:
+  import orjson
+except ImportError:
+  orjson = None
+try:
+  import ujson
+except ImportError:
+  ujson = None
+
+
+# Available decoders by name, fastest first.  Every decoder accepts bytes or str.
+backends = {}
+if orjson is not None:
+  backends['orjson'] = orjson.loads
+if ujson is not None:
+  backends['ujson'] = ujson.loads
+backends['json'] = json.loads
+
+backend = next(iter(backends))
+
+
+# Selects the decoder used by loads.  None selects the fastest installed decoder.
+def set_backend(name=None):
+  global backend
+  if name is None:
+    name = next(iter(backends))
+  if name not in backends:
+    raise Exception(f'JSON backend {name} is not available.  Options are {", ".join(backends)}.')
+  backend = name
+
+
+# Parse a JSON document from a response body (bytes or str) with the selected decoder
+def loads(content):
+  return backends[backend](content)
+
+
+# Start of the imdata list and the totalCount of an APIC response body
+IMDATA = re.compile(r'"imdata"\s*:\s*\[')
+TOTAL_COUNT = re.compile(r'"totalCount"\s*:\s*"?(\d+)')
+
+
+# Incremental parser for an APIC response body.  Fed the body in chunks, it returns each object of the
+# imdata list as soon as it is complete, so only one object (plus a partial chunk) is held at a time.
+# The end of an object is found by tracking bracket depth and strings across chunks, so each character is
+# scanned once and an object is decoded once, however many chunks it spans.
+# totalCount is available once it has been read.
+class ImdataParser(object):
+  __structure = re.compile(r'[{}\[\]"]')
+  __string = re.compile(r'["\\]')
+
+  def __init__(self):
+    self.total_count = None
+    self.__text = codecs.getincrementaldecoder('utf-8')()
+    self.__json = json.JSONDecoder()
+    self.__buffer = ''
+    self.__state = 'header'
+    self.__parts = []
+    self.__depth = 0
+    self.__in_string = False
+    self.__escape = False
+
+  @property
+  def done(self):
+    return self.__state == 'trailer'
+
+  # Adds a chunk (bytes or str) of the body and returns the objects completed by it
+  def feed(self, chunk):
+    text = self.__text.decode(chunk) if type(chunk) is bytes else chunk
+    objects = []
+    if self.__state == 'header':
+      self.__buffer += text
+      match = IMDATA.search(self.__buffer)
+      if match is None:
+        return objects
+      self.__read_total_count(self.__buffer[:match.start()])
+      text = self.__buffer[match.end():]
+      self.__buffer = ''
+      self.__state = 'imdata'
+    if self.__state == 'imdata':
+      text = self.__read_objects(text, objects)
+    if self.__state == 'trailer':
+      self.__buffer = self.__buffer[-64:] + text
+      self.__read_total_count(self.__buffer)
+    return objects
+
+  # Reads the objects completed by text into objects.  The text of an object spanning chunks is kept in parts
+  # and joined once the object is complete.  Returns the text after the end of imdata, if it was reached.
+  def __read_objects(self, text, objects):
+    pos = 0
+    length = len(text)
+    while True:
+      if self.__depth == 0:
+        while pos < length and text[pos] in ' \t\r\n,':
+          pos += 1
+        if pos == length:
+          return ''
+        if text[pos] == ']':
+          self.__state = 'trailer'
+          return text[pos + 1:]
+        if text[pos] != '{':
+          raise Exception(f'Invalid response.  Unexpected "{text[pos]}" in imdata.')
+      start = pos
+      end = self.__object_end(text, pos)
+      if end is None:
+        self.__parts.append(text[start:])
+        return ''
+      self.__parts.append(text[start:end])
+      objects.append(self.__json.decode(''.join(self.__parts)))
+      self.__parts = []
+      pos = end
+
+  # Scans text from pos for the end of the object being read, keeping bracket depth and string state across
+  # chunks.  Returns the position after its closing brace, or None if text ends inside it.
+  def __object_end(self, text, pos):
+    if self.__escape:
+      self.__escape = False
+      pos += 1
+    while True:
+      if self.__in_string:
+        match = self.__string.search(text, pos)
+        if match is None:
+          return None
+        if match.group() == '\\':
+          if match.end() == len(text):
+            # The escaped character is in the next chunk
+            self.__escape = True
+            return None
+          pos = match.end() + 1
+          continue
+        self.__in_string = False
+        pos = match.end()
+        continue
+      match = self.__structure.search(text, pos)
+      if match is None:
+        return None
+      pos = match.end()
+      if match.group() == '"':
+        self.__in_string = True
+      elif match.group() in '{[':
+        self.__depth += 1
+      else:
+        self.__depth -= 1
+        if self.__depth == 0:
+          return pos
+
+  def __read_total_count(self, text):
+    if self.total_count is None:
+      match = TOTAL_COUNT.search(text)
+      if match is not None:
+        self.total_count = int(match.group(1))
+
+  # Call at the end of the body.  Raises if the body ended inside the imdata list.
+  def close(self):
+    if self.__state != 'trailer':
+      raise Exception('Incomplete response.  The body ended before the end of imdata.')
+
+
+# Generator yielding each object of the imdata list of a complete JSON body (bytes or str), decoded one at a time
+# by the C scanner of the json module.  The body is converted to text a chunk at a time, so besides the body only
+# a chunk and the current object are held.  An object spanning chunks is retried with geometrically more text,
+# so a large object costs linear time.
+#  header - optional dictionary, populated with totalCount once it has been read, and imdata (True) once the
+#           imdata list has been found.  A body without imdata yields nothing.
+def iter_body(content, header=None, chunk_size=1024 * 1024):
+  header = header if header is not None else {}
+  text = codecs.getincrementaldecoder('utf-8')() if type(content) is bytes else None
+  offset = 0
+
+  def read():
+    nonlocal offset
+    chunk = content[offset:offset + chunk_size]
+    offset += chunk_size
+    if text is not None:
+      return text.decode(chunk, offset >= len(content))
+    return chunk
+
+  json_decoder = json.JSONDecoder()
+  buffer = ''
+  while True:
+    if offset >= len(content):
+      return
+    searched = max(0, len(buffer) - 32)
+    buffer += read()
+    match = IMDATA.search(buffer, searched)
+    if match is not None:
+      break
+  read_total_count(buffer[:match.start()], header)
+  header['imdata'] = True
+  buffer = buffer[match.end():]
+  pos = 0
+  while True:
+    while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+      pos += 1
+    if pos == len(buffer):
+      if offset >= len(content):
+        raise Exception('Incomplete response.  The body ended before the end of imdata.')
+      buffer = read()
+      pos = 0
+      continue
+    if buffer[pos] == ']':
+      break
+    try:
+      o, pos = json_decoder.raw_decode(buffer, pos)
+    except json.JSONDecodeError:
+      if offset >= len(content):
+        raise
+      # The object continues in the next chunks
+      needed = 2 * (len(buffer) - pos)
+      buffer = buffer[pos:]
+      pos = 0
+      while len(buffer) < needed and offset < len(content):
+        buffer += read()
+      continue
+    yield o
+  trailer = buffer[pos + 1:]
+  while offset < len(content):
+    trailer = trailer[-64:] + read()
+    read_total_count(trailer, header)
+  read_total_count(trailer, header)
+
+
+# Reads totalCount from text into header, unless it has been read
+def read_total_count(text, header):
+  if header.get('totalCount') is None:
+    match = TOTAL_COUNT.search(text)
+    if match is not None:
+      header['totalCount'] = int(match.group(1))
+
+
+# Generator yielding each imdata object from an iterable of body chunks
+def iter_imdata(chunks, parser=None):
+  parser = parser if parser is not None else ImdataParser()
+  for chunk in chunks:
+    yield from parser.feed(chunk)
+  parser.close()
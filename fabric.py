@@ -1,14 +1,65 @@
 import node               # Node object for connection to APICs, Leaves, and Spines
 from ip import IP         # IP object for ipv4 address functions
-import copy               # Copy object to clone class objects
+import asyncio            # asyncio module to detect fabrics of AsyncNodes
+from filters import F     # Filter builder for query filters
+from topology import Topology   # Topology object caching the fabric nodes
 
 
+# Numbers of the vlans of vlanCktEp encaps (vlan-<number>), sorted
+def vlan_numbers(encaps):
+  return sorted(int(o[5:]) for o in set(encaps))
+
+
+# Packet records of an acllog<action>L3Pkt query result (see Fabric.packets)
+def packet_records(act, data):
+  cls = f'acllog{act}L3Pkt'
+  pkts = []
+  for p in data.imdata:
+    dn = p[cls]['attributes']['dn']
+    js = {
+      'action': act.lower(),
+      'node': dn[:dn.find('/ndbgs/')],
+      'vrf': dn[dn.find('/acllog/')+8:dn.find(f'/{act.lower()}l3')],
+      'vrfEncap': p[cls]['attributes']['vrfEncap'],
+      'protocol': p[cls]['attributes']['protocol'],
+      'length': int(p[cls]['attributes']['pktLen']),
+      'timestamp': p[cls]['attributes']['timeStamp'],
+      'src': {
+        'epgName': p[cls]['attributes']['srcEpgName'],
+        'interface': p[cls]['attributes']['srcIntf'],
+        'ip': p[cls]['attributes']['srcIp'],
+        'mac': p[cls]['attributes']['srcMacAddr'],
+        'pcTag': int(p[cls]['attributes']['srcPcTag']),
+        'port': p[cls]['attributes']['srcPort']
+      },
+      'dst': {
+        'epgName': p[cls]['attributes']['dstEpgName'],
+        'ip': p[cls]['attributes']['dstIp'],
+        'mac': p[cls]['attributes']['dstMacAddr'],
+        'pcTag': int(p[cls]['attributes']['dstPcTag']),
+        'port': p[cls]['attributes']['dstPort']
+      }
+    }
+    pkts.append(js)
+  return pkts
+
+
+# Payload deleting the object of a naming-only query result
+def deleted_payload(data):
+  cls, obj = next(iter(data.imdata[0].items()))
+  return {cls: dict(obj, attributes=dict(obj['attributes'], status='deleted'))}
+
+
+# A Fabric of AsyncNodes has the same surface, with every property and method that queries the fabric awaitable,
+# e.g. await fab.leaf_ids or await fab.packets(tenant='common').
 class Fabric(object):
-  def __init__(self, apic, username=None, password=None):
+  def __init__(self, apic, username=None, password=None, topology_ttl=300):
     if isinstance(apic, node.Node):
       self.__apic = apic
     else:
       self.__apic = node.Node(apic, username, password)
+    self.__topology = Topology(self, topology_ttl)
+    self.__nodes = {}
 
   @property
   def apic(self):
@@ -21,143 +72,177 @@ class Fabric(object):
     elif type(apic) is str:
       self.__apic = node.Node(apic)
 
+  # True when the apic is an AsyncNode
+  @property
+  def is_async(self):
+    return asyncio.iscoroutinefunction(self.apic.get)
+
   @property
   def name(self):
+    if self.is_async:
+      return self.__name_async()
     return self.query('infraCont').run().value('fbDmNm')
 
+  async def __name_async(self):
+    return (await self.query('infraCont').run()).value('fbDmNm')
+
+  # Fabric nodes, loaded once and refreshed after topology_ttl seconds or on a subscription event
+  @property
+  def topology(self):
+    if self.__topology is None:
+      self.__topology = Topology(self)
+    return self.__topology
+
   @property
   def node_ids(self):
-    data = self.query('fabricNode').run()
-    nodes = [int(n) for n in data.attribute('id')]
-    nodes.sort()
-    return nodes
+    return self.__ids()
 
   @property
   def apic_ids(self):
-    data = self.query('fabricNode', filter='role=controller').run()
-    nodes = [int(n) for n in data.attribute('id')]
-    nodes.sort()
-    return nodes
+    return self.__ids('controller')
 
   @property
   def spine_ids(self):
-    data = self.query('fabricNode', filter='role=spine').run()
-    nodes = [int(n) for n in data.attribute('id')]
-    nodes.sort()
-    return nodes
+    return self.__ids('spine')
 
   @property
   def leaf_ids(self):
-    data = self.query('fabricNode', filter='role=leaf').run()
-    nodes = [int(n) for n in data.attribute('id')]
-    nodes.sort()
-    return nodes
+    return self.__ids('leaf')
+
+  def __ids(self, role=None):
+    if self.is_async:
+      return self.__ids_async(role)
+    return self.topology.current().ids(role)
+
+  async def __ids_async(self, role=None):
+    return (await self.topology.current_async()).ids(role)
 
   @property
   def vlans_in_use(self):
-    vlans = self.query('vlanCktEp', filter='wcard(vlanCktEp.encap, "vlan-")').run().attribute('encap')
-    vlans = list(set(vlans))
-    vlan_nums = [int(o[5:]) for o in vlans]
-    vlan_nums.sort()
-    return vlan_nums
+    query = self.query('vlanCktEp', filter=F.wcard('vlanCktEp.encap', 'vlan-'))
+    if self.is_async:
+      return self.__vlans_in_use_async(query)
+    return vlan_numbers(query.run().attribute('encap'))
+
+  async def __vlans_in_use_async(self, query):
+    return vlan_numbers((await query.run()).attribute('encap'))
 
+  # Node handle of a switch or controller by id (see Node.handle).  Handles are created on first use and kept, so
+  # repeated calls return the same handle, which shares the APIC node's connection pool and credentials.
+  # Awaitable for a fabric of AsyncNodes.
   def node(self, id):
-    address = self.query('topSystem', filter=f'eq(topSystem.id, "{id}")').run().value('oobMgmtAddr')
-    node = copy.deepcopy(self.apic)
-    node.address = address
-    node.fabric = self
-    return node
+    if self.is_async:
+      return self.__node_async(id)
+    return self.__node(id, self.topology.current())
+
+  async def __node_async(self, id):
+    return self.__node(id, await self.topology.current_async())
+
+  def __node(self, id, topology):
+    address = topology.oob_address(id)
+    if address is None:
+      raise Exception(f'Node {id} was not found in the fabric.')
+    handle = self.__nodes.get(int(id))
+    # A node readdressed since its handle was created gets a new handle
+    if handle is None or handle.address != address:
+      handle = self.apic.handle(address)
+      handle.fabric = self
+      self.__nodes[int(id)] = handle
+    return handle
+
+  # Node handles created so far, by id
+  @property
+  def nodes(self):
+    return dict(self.__nodes)
 
   # Post function used to send Post messages to fabric
   def post(self, path, payload=None):
     return self.apic.post(path, payload)
 
+  # Post to the fabric and return the response of the post
+  def send(self, path, payload=None):
+    return self.apic.send(path, payload)
+
   def login(self, user=None, password=None):
     return self.apic.login(user, password)
 
   # Creates a Query object associated with the current fabric with provided parameters
   def query(self, path=None, filter=None, target=None, target_class=None, include=None, subtree=None, subtree_class=None,
-            subtree_filter=None, subtree_include=None, order=None):
+            subtree_filter=None, subtree_include=None, order=None, page_size=None):
     return self.apic.query(path=path, filter=filter, target=target, target_class=target_class, include=include,
                   subtree=subtree, subtree_class=subtree_class, subtree_filter=subtree_filter,
-                  subtree_include=subtree_include, order=order)
+                  subtree_include=subtree_include, order=order, page_size=page_size)
   
+  # Pulls the policy universe and operational classes into a snapshot (see snapshot.py), saved to path if provided.
+  # Returns the Snapshot, which SnapshotNode serves queries from.  Awaitable for a fabric of AsyncNodes.
+  def snapshot(self, path=None, roots=None, classes=None, page_size=None):
+    import snapshot   # snapshot module, imported here as SnapshotNode subclasses node.Node
+    roots = roots if roots is not None else snapshot.ROOTS
+    classes = classes if classes is not None else snapshot.CLASSES
+    if self.is_async:
+      return snapshot.take_async(self, path, roots, classes, page_size)
+    return snapshot.take(self, path, roots, classes, page_size)
+
+  # Fetches several classes below path in one query and returns a dict of Data per class, e.g.
+  #   fab.batch('uni/tn-common', ['fvCtx', 'fvBD', 'fvAp', 'fvAEPg'])
+  # Awaitable for a fabric of AsyncNodes.
+  def batch(self, path, classes, target='subtree'):
+    return self.query(path, target=target).run_batch(classes)
+
   # Create and hrun a query, equivalent to query(params).run()
   def qr(self, *args, **kwargs):
     return self.query(*args, **kwargs).run()
 
-  # Trigger ACI to remove an object indicated by dn
+  # Trigger ACI to remove an object indicated by dn.  Awaitable for a fabric of AsyncNodes.
   def remove_object(self, dn):
-    payload = self.query(dn, include='naming').run().json
-    payload[list(payload.keys())[0]]['attributes']['status'] = 'deleted'
-    return self.post(payload) == 200
+    if self.is_async:
+      return self.__remove_object_async(dn)
+    return self.post(deleted_payload(self.query(dn, include='naming').run())) == 200
+
+  async def __remove_object_async(self, dn):
+    return await self.post(deleted_payload(await self.query(dn, include='naming').run())) == 200
   
-# Pull a list of packets/frames seen by the fabric
+  # Pull a list of packets/frames seen by the fabric
+  #  ip - source or destination ip.  An ip with a mask is matched with wcard.
+  #  window_start, window_end - only packets with a timestamp after window_start and before window_end
+  # Awaitable for a fabric of AsyncNodes.
   def packets(self, ip=None, tenant=None, port=None, action=None, window_start=None, window_end=None):
-    pkts = []
-    filter_list = []
     if action is not None:
       if action not in ['Permit', 'Drop']:
         raise Exception('Invalid action. Possible values are Permit and Drop.')
       action = [action]
     else:
       action = ['Permit', 'Drop']
+    queries = {}
     for act in action:
       cls = f'acllog{act}L3Pkt'
+      conditions = []
       if ip is not None:
         if '/' in ip:
-          filter_list.append(f'or(wcard({cls}.srcIp, "{ip}"), wcard({cls}.dstIp, "{ip}"))')
+          conditions.append(F.wcard(f'{cls}.srcIp', ip) | F.wcard(f'{cls}.dstIp', ip))
         else:
-          filter_list.append(f'or(eq({cls}.srcIp, "{ip}"), eq({cls}.dstIp, "{ip}"))')
+          conditions.append(F.eq(f'{cls}.srcIp', ip) | F.eq(f'{cls}.dstIp', ip))
       if tenant is not None:
-        filter_list.append(f'wcard({cls}.dn, "/tn-{tenant}/")')
+        conditions.append(F.wcard(f'{cls}.dn', f'/tn-{tenant}/'))
       if port is not None:
-        filter_list.append(f'or(eq({cls}.srcPort, "{port}"), eq({cls}.dstPort, "{port}"))')
+        conditions.append(F.eq(f'{cls}.srcPort', port) | F.eq(f'{cls}.dstPort', port))
       if window_start is not None:
-        filter_list.append(f'gt({cls}.timeStamp, "{window_start}")')
+        conditions.append(F.gt(f'{cls}.timeStamp', window_start))
       if window_end is not None:
-        filter_list.append(f'gt({cls}.timeStamp, "{window_end}")')
-      if len(filter_list) == 0:
-        filter = None
-      else:
-        filter = filter_list[0]
-        if len(filter_list) > 1:
-          for o in filter_list[1:]:
-            filter += ',' + o
-          filter = f'and({filter})'
-      data = self.query(cls, filter=filter)
-#      qry = self.query(cls)
-#      if filter is not None:
-#        qry.filter = filter
-      for p in data.imdata:
-        dn = p[cls]['attributes']['dn']
-        js = {
-          'action': act.lower(),
-          'node': dn[:dn.find('/ndbgs/')],
-          'vrf': dn[dn.find('/acllog/')+8:dn.find(f'/{act.lower()}l3')],
-          'vrfEncap': p[cls]['attributes']['vrfEncap'],
-          'protocol': p[cls]['attributes']['protocol'],
-          'length': int(p[cls]['attributes']['pktLen']),
-          'timestamp': p[cls]['attributes']['timeStamp'],
-          'src': {
-            'epgName': p[cls]['attributes']['srcEpgName'],
-            'interface': p[cls]['attributes']['srcIntf'],
-            'ip': p[cls]['attributes']['srcIp'],
-            'mac': p[cls]['attributes']['srcMacAddr'],
-            'pcTag': int(p[cls]['attributes']['srcPcTag']),
-            'port': p[cls]['attributes']['srcPort']
-          },
-          'dst': {
-            'epgName': p[cls]['attributes']['dstEpgName'],
-            'ip': p[cls]['attributes']['dstIp'],
-            'mac': p[cls]['attributes']['dstMacAddr'],
-            'pcTag': int(p[cls]['attributes']['dstPcTag']),
-            'port': p[cls]['attributes']['dstPort']
-          }
-        }
-        pkts.append(js)
-    return pkts
+        conditions.append(F.lt(f'{cls}.timeStamp', window_end))
+      queries[act] = self.query(cls, filter=F.and_(*conditions) if len(conditions) > 0 else None)
+    if self.is_async:
+      return self.__packets_async(queries)
+    return [p for act, query in queries.items() for p in packet_records(act, query.run())]
+
+  async def __packets_async(self, queries):
+    return [p for act, query in queries.items() for p in packet_records(act, await query.run())]
   
-  # Provide a list of trancievers connected to leaves in the fabric
+  # Provide a list of trancievers connected to leaves in the fabric.  Awaitable for a fabric of AsyncNodes.
   def transceiver_count(self):
+    if self.is_async:
+      return self.__transceiver_count_async()
     return self.query('ethpmFcot').run().sum('typeName', True)
+
+  async def __transceiver_count_async(self):
+    return (await self.query('ethpmFcot').run()).sum('typeName', True)
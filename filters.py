@@ -0,0 +1,308 @@
+import abc          # abc module for the abstract Condition base
+import re           # re module for wcard pattern matching
+import functools    # functools module to cache parsed filter expressions
+
+
+# Local evaluation of APIC query-target-filter expressions, e.g.
+#   and(eq(fvBD.name, "bd1"), or(wcard(fvBD.dn, "/tn-common/"), ne(fvBD.arpFlood, "yes")))
+# Filters are parsed into a tree of conditions that can be evaluated against APIC objects, so results already
+# fetched (cached, snapshot or Data) can be narrowed without another request.
+#  eq, ne - string equality
+#  lt, gt, le, ge, bw - numeric comparison when both values are numbers, string comparison otherwise.
+#                       bw is inclusive of both bounds.
+#  wcard - regular expression search in the value
+#  and, or, not - logical operators
+# A comparison on an attribute of another class than the object's is false, as on the APIC.
+
+property_pattern = re.compile(r'^[A-Za-z][A-Za-z0-9]*\.[A-Za-z_][A-Za-z0-9_]*$')
+
+COMPARISONS = {'eq': 1, 'ne': 1, 'lt': 1, 'gt': 1, 'le': 1, 'ge': 1, 'wcard': 1, 'bw': 2}
+OPERATORS = ['and', 'or', 'not']
+
+
+# Base of the parsed filter conditions.  Conditions combine with & (and), | (or) and ~ (not); the result is
+# in canonical form, so str() of semantically identical filters is identical.
+class Condition(abc.ABC):
+  # True if the object of class cls with the given attributes matches the condition
+  @abc.abstractmethod
+  def evaluate(self, cls, attributes):
+    pass
+
+  def __and__(self, other):
+    return F.and_(self, other)
+
+  def __or__(self, other):
+    return F.or_(self, other)
+
+  def __invert__(self):
+    return F.not_(self)
+
+  # True if an APIC object, e.g. {'fvBD': {'attributes': {...}}}, matches the condition
+  def matches(self, o):
+    cls = next(iter(o))
+    return self.evaluate(cls, o[cls].get('attributes', {}))
+
+  def __repr__(self):
+    return f'{type(self).__name__}({str(self)!r})'
+
+
+# Comparison of a class attribute with one value (two for bw)
+class Comparison(Condition):
+  def __init__(self, op, cls, attribute, values):
+    if op not in COMPARISONS:
+      raise Exception(f'Invalid filter operator {op}.  Options are {", ".join(list(COMPARISONS) + OPERATORS)}.')
+    if len(values) != COMPARISONS[op]:
+      raise Exception(f'Invalid filter.  {op} takes {COMPARISONS[op] + 1} arguments.')
+    if property_pattern.match(f'{cls}.{attribute}') is None:
+      raise Exception(f'Invalid filter property {cls}.{attribute}.  Must be given as class.attribute.')
+    self.op = op
+    self.cls = cls
+    self.attribute = attribute
+    self.values = tuple(str(value) for value in values)
+    self.__pattern = None
+    if op == 'wcard':
+      try:
+        self.__pattern = re.compile(self.values[0])
+      except re.error:
+        self.__pattern = re.compile(re.escape(self.values[0]))
+
+  def __str__(self):
+    values = ', '.join('"' + value.replace('"', '\\"') + '"' for value in self.values)
+    return f'{self.op}({self.cls}.{self.attribute}, {values})'
+
+  def __eq__(self, other):
+    return isinstance(other, Comparison) and str(self) == str(other)
+
+  def __hash__(self):
+    return hash(str(self))
+
+  def evaluate(self, cls, attributes):
+    if cls != self.cls or self.attribute not in attributes:
+      return False
+    value = attributes[self.attribute]
+    if self.op == 'eq':
+      return value == self.values[0]
+    if self.op == 'ne':
+      return value != self.values[0]
+    if self.op == 'wcard':
+      return self.__pattern.search(value) is not None
+    if self.op == 'bw':
+      low, value, high = comparable(self.values[0], value, self.values[1])
+      return low <= value <= high
+    value, other = comparable(value, self.values[0])
+    if self.op == 'lt':
+      return value < other
+    if self.op == 'gt':
+      return value > other
+    if self.op == 'le':
+      return value <= other
+    return value >= other
+
+
+# and/or/not of other conditions
+class Logical(Condition):
+  def __init__(self, op, operands):
+    if op not in OPERATORS:
+      raise Exception(f'Invalid filter operator {op}.  Options are {", ".join(list(COMPARISONS) + OPERATORS)}.')
+    operands = tuple(operands)
+    if len(operands) == 0 or (op == 'not' and len(operands) != 1):
+      raise Exception(f'Invalid filter.  Wrong number of arguments to {op}.')
+    self.op = op
+    self.operands = operands
+
+  def __str__(self):
+    return f'{self.op}({",".join(str(o) for o in self.operands)})'
+
+  def __eq__(self, other):
+    return isinstance(other, Logical) and str(self) == str(other)
+
+  def __hash__(self):
+    return hash(str(self))
+
+  def evaluate(self, cls, attributes):
+    if self.op == 'and':
+      return all(o.evaluate(cls, attributes) for o in self.operands)
+    if self.op == 'or':
+      return any(o.evaluate(cls, attributes) for o in self.operands)
+    return not self.operands[0].evaluate(cls, attributes)
+
+
+# Values as numbers if they all are, otherwise as strings
+def comparable(*values):
+  try:
+    return [int(value) for value in values]
+  except ValueError:
+    pass
+  try:
+    return [float(value) for value in values]
+  except ValueError:
+    return list(values)
+
+
+token_pattern = re.compile(r'\s*(?:(\()|(\))|(,)|"((?:[^"\\]|\\.)*)"|([^\s(),"]+))')
+
+
+def tokenize(text):
+  tokens = []
+  pos = 0
+  text = text.rstrip()
+  while pos < len(text):
+    match = token_pattern.match(text, pos)
+    if match is None:
+      raise Exception(f'Invalid filter.  Unable to parse "{text[pos:]}".')
+    pos = match.end()
+    if match.group(4) is not None:
+      tokens.append(('string', match.group(4).replace('\\"', '"')))
+    else:
+      tokens.append(('symbol', match.group(0).strip()))
+  return tokens
+
+
+# Parses a query-target-filter expression into a Condition.  Parsed filters are cached.
+@functools.lru_cache(maxsize=512)
+def parse(text):
+  tokens = tokenize(text)
+  condition, pos = parse_condition(tokens, 0, text)
+  if pos != len(tokens):
+    raise Exception(f'Invalid filter {text}.  Unexpected text after the end of the filter.')
+  return condition
+
+
+def parse_condition(tokens, pos, text):
+  if pos + 1 >= len(tokens) or tokens[pos][0] != 'symbol' or tokens[pos + 1] != ('symbol', '('):
+    raise Exception(f'Invalid filter {text}.  Expected an operator, e.g. eq(...).')
+  op = tokens[pos][1]
+  pos += 2
+  arguments = []
+  while True:
+    if pos >= len(tokens):
+      raise Exception(f'Invalid filter {text}.  Missing ")".')
+    if op in OPERATORS:
+      argument, pos = parse_condition(tokens, pos, text)
+    else:
+      argument = tokens[pos][1]
+      pos += 1
+    arguments.append(argument)
+    if pos < len(tokens) and tokens[pos] == ('symbol', ','):
+      pos += 1
+    elif pos < len(tokens) and tokens[pos] == ('symbol', ')'):
+      pos += 1
+      break
+    else:
+      raise Exception(f'Invalid filter {text}.  Expected "," or ")".')
+  if op in OPERATORS:
+    return Logical(op, arguments), pos
+  if op not in COMPARISONS:
+    raise Exception(f'Invalid filter operator {op}.  Options are {", ".join(list(COMPARISONS) + OPERATORS)}.')
+  prop = arguments[0]
+  if '.' not in prop:
+    raise Exception(f'Invalid filter {text}.  Properties must be given as class.attribute.')
+  return Comparison(op, prop[:prop.find('.')], prop[prop.find('.') + 1:], arguments[1:]), pos
+
+
+# Filter builder.  Builds validated conditions, e.g.
+#   F.eq('fvTenant.name', 'common') & (F.wcard('fvBD.dn', '/tn-common/') | ~F.eq('fvBD.arpFlood', 'yes'))
+# prop is given as class.attribute.  Values are converted to strings.
+class F(object):
+  @staticmethod
+  def compare(op, prop, *values):
+    if type(prop) is not str or '.' not in prop:
+      raise Exception(f'Invalid filter property {prop}.  Must be given as class.attribute.')
+    return Comparison(op, prop[:prop.find('.')], prop[prop.find('.') + 1:], values)
+
+  @staticmethod
+  def eq(prop, value):
+    return F.compare('eq', prop, value)
+
+  @staticmethod
+  def ne(prop, value):
+    return F.compare('ne', prop, value)
+
+  @staticmethod
+  def lt(prop, value):
+    return F.compare('lt', prop, value)
+
+  @staticmethod
+  def gt(prop, value):
+    return F.compare('gt', prop, value)
+
+  @staticmethod
+  def le(prop, value):
+    return F.compare('le', prop, value)
+
+  @staticmethod
+  def ge(prop, value):
+    return F.compare('ge', prop, value)
+
+  @staticmethod
+  def wcard(prop, pattern):
+    return F.compare('wcard', prop, pattern)
+
+  @staticmethod
+  def bw(prop, low, high):
+    return F.compare('bw', prop, low, high)
+
+  # and of the conditions.  Nested ands are flattened and the operands deduplicated and sorted.
+  @staticmethod
+  def and_(*conditions):
+    return F.logical('and', conditions)
+
+  # or of the conditions, in the same canonical form as and_
+  @staticmethod
+  def or_(*conditions):
+    return F.logical('or', conditions)
+
+  @staticmethod
+  def not_(c):
+    c = condition(c)
+    if isinstance(c, Logical) and c.op == 'not':
+      return c.operands[0]
+    return Logical('not', [c])
+
+  @staticmethod
+  def logical(op, conditions):
+    operands = {}
+    for c in conditions:
+      c = condition(c)
+      for o in (c.operands if isinstance(c, Logical) and c.op == op else [c]):
+        operands[str(o)] = o
+    if len(operands) == 1:
+      return next(iter(operands.values()))
+    return Logical(op, [operands[key] for key in sorted(operands)])
+
+
+# Canonical form of a condition: ands and ors flattened, deduplicated and sorted, double negation removed
+def canonical_condition(c):
+  if isinstance(c, Comparison):
+    return c
+  if c.op == 'not':
+    return F.not_(canonical_condition(c.operands[0]))
+  return F.logical(c.op, [canonical_condition(o) for o in c.operands])
+
+
+# Canonical filter string of a filter given as a string or a Condition.  Strings that can not be parsed
+# locally (e.g. operators not supported here) are passed through unchanged for the APIC to evaluate.
+def canonical(filter):
+  if isinstance(filter, Condition):
+    return str(canonical_condition(filter))
+  try:
+    return str(canonical_condition(parse(filter)))
+  except Exception:
+    return filter
+
+
+# Condition of a filter given as a string or a Condition
+def condition(filter):
+  return filter if isinstance(filter, Condition) else parse(filter)
+
+
+# Objects of imdata matching the filter
+def apply(filter, imdata):
+  filter = condition(filter)
+  return [o for o in imdata if filter.matches(o)]
+
+
+# Narrows a decoded query response (totalCount and imdata) to the objects matching the filter
+def narrow(content, filter):
+  imdata = apply(filter, content['imdata'])
+  return {'totalCount': str(len(imdata)), 'imdata': imdata}
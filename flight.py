@@ -0,0 +1,91 @@
+import asyncio      # asyncio module for coalescing coroutines on an event loop
+import copy         # copy module used to hand each waiting caller its own result
+import threading    # threading module for coalescing calls across threads
+
+
+# SingleFlight coalesces concurrent identical requests.
+# The first caller for a key starts the request; callers arriving while it is in flight wait for it and
+# receive a copy of the same result (or the same exception) instead of sending their own request.
+class SingleFlight(object):
+  def __init__(self):
+    self.__calls = {}
+    self.__futures = {}
+    self.__lock = threading.Lock()
+    self.requests = 0
+    self.shared = 0
+
+  # A copied node gets its own, idle, SingleFlight
+  def __deepcopy__(self, memo):
+    return SingleFlight()
+
+  @property
+  def stats(self):
+    return {'requests': self.requests, 'shared': self.shared}
+
+  @property
+  def in_flight(self):
+    return len(self.__calls) + len(self.__futures)
+
+  # Detaches the calls in flight, e.g. after a post that may change their results.  Callers arriving later start
+  # new calls instead of joining them; callers already waiting still receive their results.
+  def detach(self):
+    with self.__lock:
+      self.__calls.clear()
+      self.__futures.clear()
+
+  # Runs function() once for all concurrent callers with the same key
+  def do(self, key, function):
+    with self.__lock:
+      call = self.__calls.get(key)
+      if call is None:
+        call = {'done': threading.Event(), 'value': None, 'error': None, 'waiting': 0}
+        self.__calls[key] = call
+        self.requests += 1
+        leader = True
+      else:
+        call['waiting'] += 1
+        self.shared += 1
+        leader = False
+    if not leader:
+      call['done'].wait()
+      if call['error'] is not None:
+        raise call['error']
+      return copy.deepcopy(call['value'])
+    try:
+      value = function()
+    except Exception as e:
+      call['error'] = e
+      raise
+    else:
+      call['value'] = value
+    finally:
+      with self.__lock:
+        if self.__calls.get(key) is call:
+          del self.__calls[key]
+        if call['error'] is None and call['waiting'] > 0:
+          call['value'] = copy.deepcopy(call['value'])
+      call['done'].set()
+    return value
+
+  # Runs the coroutine returned by function() once for all concurrent callers on the event loop with the same key.
+  # The coroutine runs as its own task, which callers await through asyncio.shield: a caller that is cancelled
+  # (e.g. by a timeout) gives up waiting without cancelling the request for the other callers.
+  async def do_async(self, key, function):
+    call = self.__futures.get(key)
+    if call is None:
+      call = {'task': asyncio.ensure_future(function()), 'callers': 0}
+      self.__futures[key] = call
+      self.requests += 1
+      call['task'].add_done_callback(lambda task: self.__finished(key, call))
+    else:
+      self.shared += 1
+    call['callers'] += 1
+    value = await asyncio.shield(call['task'])
+    return copy.deepcopy(value) if call['callers'] > 1 else value
+
+  def __finished(self, key, call):
+    if self.__futures.get(key) is call:
+      del self.__futures[key]
+    # Marks the exception as retrieved, in case every caller gave up waiting
+    if not call['task'].cancelled():
+      call['task'].exception()
@@ -0,0 +1,124 @@
+import threading    # threading module for the state lock and the background probe thread
+import time         # time module for the circuit reset timeout
+
+
+# Health states of an address
+HEALTHY = 'healthy'
+SUSPECT = 'suspect'
+OPEN = 'open'
+
+
+# Reachability of one node address, fed by the results of the node's requests.
+# A request that fails to connect or times out makes the address suspect; threshold failures in a row open the
+# circuit.  While the circuit is open, requests fail immediately without a connection attempt.  After reset
+# seconds one trial request is let through: its success closes the circuit, its failure opens it again.
+# A trial that ends neither way within reset seconds (e.g. a cancelled task or an abandoned thread) lapses, and
+# the next request is let through as a new trial.  Any response (whatever its status code) is a success.
+class Health(object):
+  def __init__(self, address, threshold=3, reset=30):
+    self.address = address
+    self.threshold = threshold
+    self.reset = reset
+    self.state = HEALTHY
+    self.failures = 0
+    self.opened = None
+    self.last_success = None
+    self.last_failure = None
+    self.__trial = None
+    self.__lock = threading.Lock()
+    self.__probe = None
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  # Health is per address, so copied nodes share it
+  def __deepcopy__(self, memo):
+    return self
+
+  # Seconds until an open circuit lets a trial request through
+  @property
+  def remaining(self):
+    if self.state != OPEN:
+      return 0
+    return max(0, self.opened + self.reset - time.monotonic())
+
+  # Raises if the circuit is open.  Called before each request.
+  def check(self):
+    with self.__lock:
+      if self.state != OPEN:
+        return
+      now = time.monotonic()
+      remaining = self.opened + self.reset - now
+      if remaining <= 0 and (self.__trial is None or now - self.__trial > self.reset):
+        self.__trial = now
+        return
+    raise Exception(f'Unable to connect to {self.address}.  The node is unreachable; requests are failing fast for '
+                    f'another {max(0, remaining):.1f} seconds.')
+
+  def succeeded(self):
+    with self.__lock:
+      self.state = HEALTHY
+      self.failures = 0
+      self.opened = None
+      self.last_success = time.monotonic()
+      self.__trial = None
+
+  def failed(self):
+    with self.__lock:
+      self.failures += 1
+      self.last_failure = time.monotonic()
+      if self.state == OPEN or self.failures >= self.threshold:
+        self.state = OPEN
+        self.opened = self.last_failure
+      else:
+        self.state = SUSPECT
+      self.__trial = None
+
+  @property
+  def probing(self):
+    return self.__thread is not None and self.__thread.is_alive()
+
+  # Starts a background thread calling probe() every interval seconds while the address is not healthy.
+  # probe (e.g. Node.check_connection) reports its result through succeeded/failed itself.
+  def start_probe(self, probe, interval=10):
+    self.__probe = probe
+    if self.probing:
+      return
+    self.__stop.clear()
+    self.__thread = threading.Thread(target=self.__probe_loop, args=(interval,), daemon=True)
+    self.__thread.start()
+
+  def stop_probe(self):
+    self.__stop.set()
+    self.__thread = None
+
+  def __probe_loop(self, interval):
+    while not self.__stop.wait(interval):
+      if self.state == HEALTHY:
+        continue
+      try:
+        self.__probe()
+      except Exception:
+        pass
+
+
+# Health of every node address.  Nodes (and handles) with the same address share its Health.
+class HealthMonitor(object):
+  def __init__(self, threshold=3, reset=30):
+    self.threshold = threshold
+    self.reset = reset
+    self.__addresses = {}
+    self.__lock = threading.Lock()
+
+  def get(self, address):
+    health = self.__addresses.get(address)
+    if health is None:
+      with self.__lock:
+        health = self.__addresses.setdefault(address, Health(address, self.threshold, self.reset))
+    return health
+
+  # Health states by address
+  def states(self):
+    return {address: health.state for address, health in list(self.__addresses.items())}
+
+
+monitor = HealthMonitor()
@@ -1,3 +1,17 @@
+from filters import F   # Filter builder for query filters
+
+
+# Normalized interface id: 1, '1', 'Ethernet1/1' or 'eth1/1' to 'eth1/1'
+def interface_id(interface):
+  if type(interface) is int:
+    return f'eth1/{interface}'
+  if type(interface) is str:
+    if interface.isdigit():
+      return f'eth1/{interface}'
+    return interface.lower().replace('ethernet', 'eth')
+  raise Exception(f'Invalid interface, {interface}, provided.')
+
+
 class Interface(object):
   def __init__(self, node, interface):
     self.__node = node
@@ -16,16 +30,8 @@ class Interface(object):
 
   @id.setter
   def id(self, interface):
-    if type(interface) is int:
-      interface = f'eth1/{interface}'
-    if type(interface) is str:
-      if interface.isdigit():
-        interface = f'eth1/{interface}'
-      else:
-        interface = interface.lower().replace('ethernet', 'eth')
-    else:
-      raise Exception(f'Invalid interface, {interface}, provided.')
-    d = self.__node.query('l1PhysIf', filter=f'eq(l1PhysIf.id, "{interface}"').run()
+    interface = interface_id(interface)
+    d = self.__node.query('l1PhysIf', filter=F.eq('l1PhysIf.id', interface)).run()
     if d.count != 1:
       raise Exception(f'Interface {interface} was not found on {self.__node.name}.')
     self.__id = interface
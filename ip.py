@@ -1,4 +1,7 @@
 import socket
+import asyncio      # asyncio module for hostname resolution without blocking the event loop
+import threading    # threading module for the lock guarding resolver entries
+import time         # time module for resolver entry expiry
 gateway_standard_default = 'last'
 
 
@@ -29,6 +32,74 @@ def is_ip(address):
   return True
 
 
+# Hostname resolution cache used by IP.address.
+#  ttl - number of seconds a resolved address is kept
+#  negative_ttl - number of seconds a failed resolution is kept, so a name that does not resolve fails fast
+class Resolver(object):
+  def __init__(self, ttl=300, negative_ttl=30):
+    self.ttl = ttl
+    self.negative_ttl = negative_ttl
+    self.__entries = {}
+    self.__lock = threading.Lock()
+
+  # Returns (found, ip) for a hostname.  ip is None for a cached failure.
+  def lookup(self, hostname):
+    with self.__lock:
+      entry = self.__entries.get(hostname)
+      if entry is None:
+        return False, None
+      if entry[1] < time.monotonic():
+        del self.__entries[hostname]
+        return False, None
+      return True, entry[0]
+
+  def store(self, hostname, ip):
+    ttl = self.ttl if ip is not None else self.negative_ttl
+    with self.__lock:
+      self.__entries[hostname] = (ip, time.monotonic() + ttl)
+
+  # Drops the entry of a hostname, or all entries
+  def clear(self, hostname=None):
+    with self.__lock:
+      if hostname is None:
+        self.__entries.clear()
+      else:
+        self.__entries.pop(hostname, None)
+
+  # IPv4 address of a hostname, from the cache or resolved with the system resolver
+  def resolve(self, hostname):
+    found, ip = self.lookup(hostname)
+    if not found:
+      try:
+        ip = socket.gethostbyname(hostname)
+      except socket.gaierror:
+        ip = None
+      self.store(hostname, ip)
+    if ip is None:
+      raise Exception(f'Unable to resolve hostname, {hostname}.')
+    return ip
+
+  # resolve for event loops.  Resolution runs in the loop's executor, so a slow DNS server does not block the loop.
+  # Resolving a hostname before creating an AsyncNode for it makes the node's own (synchronous) resolution a cache hit.
+  async def resolve_async(self, hostname):
+    if is_ip(hostname):
+      return hostname
+    found, ip = self.lookup(hostname)
+    if not found:
+      try:
+        info = await asyncio.get_running_loop().getaddrinfo(hostname, None, family=socket.AF_INET)
+        ip = info[0][4][0]
+      except socket.gaierror:
+        ip = None
+      self.store(hostname, ip)
+    if ip is None:
+      raise Exception(f'Unable to resolve hostname, {hostname}.')
+    return ip
+
+
+resolver = Resolver()
+
+
 # Convert between string and decimal IP.
 def decimal(ip):
   if isinstance(ip, IP):
@@ -75,10 +146,7 @@ class IP(object):
     if is_ip(address):
       self.ip = address
     else:
-      try:
-        self.ip = socket.gethostbyname(address)
-      except socket.gaierror:
-        raise Exception(f'Unable to resolve hostname, {address}.')
+      self.ip = resolver.resolve(address)
     self.__address = address
 
   @property
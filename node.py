@@ -1,19 +1,67 @@
 import requests  # Requests module used for Rest API calls
+from requests.adapters import HTTPAdapter   # HTTPAdapter used to size the session connection pool
 from datetime import datetime  # datetime module for date/time manipulation
 import json      # JSON module for interacting with JSON formatted data
+import contextvars   # contextvars module keeps the last response per thread/task
+import itertools     # itertools module for the ids of the last response holders
 
 from query import Query   # Query module provides logic to manage REST API queries
 from data import Data
 from ip import IP
 from interface import Interface
+from cache import Cache, path_dn
+from subscription import SubscriptionManager
+from flight import SingleFlight
+from session import SessionState, SessionRefresher
+import health
+import decoder
+import filters
 import fabric
 
 
+# Last response of the current thread or asyncio task, as a (LastResponse id, response) pair.  One module level
+# variable serves every node: context variables are never released by the contexts that hold them.
+last_response = contextvars.ContextVar('last_response', default=(None, None))
+
+# Ids of LastResponse holders
+last_response_ids = itertools.count()
+
+
+# dn, id, podId, name and role of a topSystem query result
+def system_values(d):
+  return {attribute: d.value(attribute) for attribute in ['dn', 'id', 'podId', 'name', 'role']}
+
+
+# Holder for the last response of a node, kept per context.  Each thread and each asyncio task sees only the
+# response of its own last request, so a node shared between threads or tasks does not mix up results.
+# A context keeps only its very last response: the response of a node is None once the context made a request
+# through another node.
+class LastResponse(object):
+  def __init__(self):
+    self.__id = next(last_response_ids)
+
+  # A copied node starts without a response
+  def __deepcopy__(self, memo):
+    return LastResponse()
+
+  def get(self):
+    id, response = last_response.get()
+    return response if id == self.__id else None
+
+  def set(self, response):
+    last_response.set((self.__id, response))
+
+
 # Fabric object used to interact with an ACI fabric.
 # Initialized with a "address" property, the management address of a fabric APIC
 # Optional username and password properties allow for authentication
 class Node(object):
-  def __init__(self, address, username=None, password=None, parent_fabric=None, auto_login=True):
+  # session - requests session to use, e.g. shared with other nodes.  Created if not provided.
+  # probe - probe the node in the background while it is unreachable (see start_probe)
+  # timeout - seconds to wait for a response
+  # connect_timeout - seconds to wait for a connection, so an unreachable node fails fast
+  def __init__(self, address, username=None, password=None, parent_fabric=None, auto_login=True, cache=None,
+               auto_refresh=False, pool_size=10, session=None, probe=False, timeout=30, connect_timeout=5):
     self.__ip = None
     self.__address = None
     self.__username = None
@@ -26,26 +74,44 @@ class Node(object):
     self.__role = None
     self.__cookies = ''
     self.__auto_login = auto_login
+    self.__cache = None
+    self.__subscriptions = None
+    self.__session_state = SessionState()
+    self.__refresher = None
+    self.__auto_refresh = auto_refresh
+    self.__flight = SingleFlight()
+    self.__response = LastResponse()
+    self.timeout = timeout
+    self.connect_timeout = connect_timeout
+    self.cache = cache
     self.username = username
     self.password = password
     self.established = 0
     requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
-    self.session = requests.session()
-    self.response = None
+    if session is None:
+      session = requests.session()
+      session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+    self.session = session
     self.address = address
+    if probe:
+      self.start_probe()
 
   @property
   def address(self):
     return self.__address
 
+  # The address is not checked when set.  Reachability is tracked from the node's requests (see health).
   @address.setter
   def address(self, address):
     if self.__address is not None and self.__address != self.address:
       self.__clear_values()
     self.__address = address
     self.ip = address
-    if not self.check_connection():
-      raise Exception(f'Unable to connect to {address}.')
+
+  # Health (reachability and circuit state) of the node's address
+  @property
+  def health(self):
+    return health.monitor.get(self.address)
 
   @property
   def ip(self):
@@ -83,31 +149,31 @@ class Node(object):
   @property
   def dn(self):
     if self.__dn is None:
-      self.__init_values()
+      self._init_values()
     return self.__dn
 
   @property
   def id(self):
     if self.__dn is None:
-      self.__init_values()
+      self._init_values()
     return self.__id
 
   @property
   def pod(self):
     if self.__dn is None:
-      self.__init_values()
+      self._init_values()
     return self.__pod
 
   @property
   def name(self):
     if self.__dn is None:
-      self.__init_values()
+      self._init_values()
     return self.__name
 
   @property
   def role(self):
     if self.__dn is None:
-      self.__init_values()
+      self._init_values()
     return self.__role
 
   @property
@@ -120,10 +186,73 @@ class Node(object):
       raise Exception('auto_login: Invalid value. Must by type boolean.')
     self.__auto_login = auto_login
 
+  # The response of the last request made by the current thread or task
+  @property
+  def response(self):
+    return self.__response.get()
+
+  @response.setter
+  def response(self, response):
+    self.__response.set(response)
+
+  # Optional result cache for get requests.  None disables caching.
+  @property
+  def cache(self):
+    return self.__cache
+
+  @cache.setter
+  def cache(self, cache):
+    if not (cache is None or isinstance(cache, Cache)):
+      raise Exception(f'Cache must be a Cache object or None. {type(cache)} provided.')
+    self.__cache = cache
+
+  # Optional SubscriptionManager.  When running, cached results are subscribed to and kept current by pushed events.
+  @property
+  def subscriptions(self):
+    return self.__subscriptions
+
+  @subscriptions.setter
+  def subscriptions(self, subscriptions):
+    if not (subscriptions is None or isinstance(subscriptions, SubscriptionManager)):
+      raise Exception(f'Subscriptions must be a SubscriptionManager object or None. {type(subscriptions)} provided.')
+    self.__subscriptions = subscriptions
+
+  # SingleFlight coalescing concurrent identical gets
+  @property
+  def flight(self):
+    return self.__flight
+
+  # Session token from the last login or refresh
+  @property
+  def token(self):
+    return self.__session_state.token
+
+  # Locally tracked session state (token and expiry)
+  @property
+  def session_state(self):
+    return self.__session_state
+
+  # When enabled, the session is refreshed in the background before it expires
+  @property
+  def auto_refresh(self):
+    return self.__auto_refresh
+
+  @auto_refresh.setter
+  def auto_refresh(self, auto_refresh):
+    if type(auto_refresh) is not bool:
+      raise Exception('auto_refresh: Invalid value. Must by type boolean.')
+    self.__auto_refresh = auto_refresh
+    if not auto_refresh and self.__refresher is not None:
+      self.__refresher.stop()
+
+  @property
+  def refresher(self):
+    return self.__refresher
+
+  # Local check of the session, based on the refresh timeout reported by the APIC
   @property
   def login_status(self):
-    self.__get('mo/topology/pod-1/node-1.json')
-    return self.response.status_code != 403
+    return self.__session_state.valid
 
   @property
   def username(self):
@@ -162,13 +291,66 @@ class Node(object):
     self.__name = None
     self.__role = None
 
-  def __init_values(self):
-    d = self.query('topSystem', filter=f'eq(topSystem.oobMgmtAddr, "{self.ip.ip}")').run()
-    self.__dn = d.value('dn')
-    self.__id = int(d.value('id'))
-    self.__pod = int(d.value('podId'))
-    self.__name = d.value('name')
-    self.__role = d.value('role')
+  # Reads the node's topSystem from the fabric topology, when the node belongs to a fabric, or with a query
+  def _init_values(self):
+    if self.fabric is not None:
+      topology = self.fabric.topology.current()
+      id = topology.by_address(self._system_address())
+      if id is not None:
+        self._set_values(topology.node(id)['topSystem'])
+        return
+    self._set_values(system_values(self.query(*self._system_query()).run()))
+
+  # True once dn, id, pod, name and role are set
+  @property
+  def _values_loaded(self):
+    return self.__dn is not None
+
+  # IP address the node's topSystem is found by
+  def _system_address(self):
+    if self.ip is None:
+      raise Exception(f'Unable to identify node {self.address}.  Its address has not been resolved to an IP address.')
+    return self.ip.ip
+
+  # Path and filter of the topSystem query of the node
+  def _system_query(self):
+    return 'topSystem', filters.F.eq('topSystem.oobMgmtAddr', self._system_address())
+
+  # Sets dn, id, pod, name and role from the node's topSystem attributes (see system_values)
+  def _set_values(self, system):
+    self.__dn = system['dn']
+    self.__id = int(system['id'])
+    self.__pod = int(system['podId'])
+    self.__name = system['name']
+    self.__role = system['role']
+
+  # Starts a SubscriptionManager so cached results are kept current by APIC push events.  Requires a cache.
+  def start_subscriptions(self, refresh_interval=45, connect=None):
+    if self.cache is None:
+      raise Exception('Subscriptions keep cached results current.  Set a cache before starting subscriptions.')
+    if self.subscriptions is None:
+      self.subscriptions = SubscriptionManager(self, refresh_interval, connect)
+    self.subscriptions.start()
+    return self.subscriptions
+
+  def stop_subscriptions(self):
+    if self.subscriptions is not None:
+      self.subscriptions.stop()
+
+  # Starts a background probe (check_connection every interval seconds) of the node while its address is suspect
+  # or its circuit is open, so the circuit closes as soon as the node is back without waiting for a trial request
+  def start_probe(self, interval=10):
+    self.health.start_probe(self.check_connection, interval)
+
+  def stop_probe(self):
+    self.health.stop_probe()
+
+  # Lightweight handle to another node of the fabric, e.g. a switch.  The handle shares this node's requests
+  # session (and so its connection pool) and credentials.  It logs in to its node on first use.
+  def handle(self, address, **kwargs):
+    return type(self)(address, self.username, self.__password, parent_fabric=self.fabric, auto_login=self.auto_login,
+                      auto_refresh=self.auto_refresh, session=self.session, timeout=self.timeout,
+                      connect_timeout=self.connect_timeout, **kwargs)
 
   def copy(self):
     import copy   # copy module for copy of class object
@@ -182,17 +364,36 @@ class Node(object):
     self.username = None
     self.password = None
 
-  # Check connection to fabric.
+  # Check connection to fabric.  The result is recorded in the node's health.
   def check_connection(self):
     try:
-      _ = requests.get(f'https://{self.address}/', timeout=5, verify=False)
-    except requests.ConnectionError:
+      _ = self.session.get(f'https://{self.address}/', timeout=5, verify=False)
+    except requests.RequestException:
+      self.health.failed()
       return False
+    self.health.succeeded()
     return True
 
   # Login function sends login request to APIC and, on success, populates cookies and established variables
   # Returns boolean of login success
+  # Logins are serialized on the session lock
   def login(self, username=None, password=None):
+    with self.session_state.lock:
+      js = self._login_payload(username, password)
+      response = self.__post('aaaLogin.json', js)
+      return response is not None and self._login_result(response)
+
+  # Logs in again after a 403.  generation is the session generation read before the failed request;
+  # if it changed, another caller has already logged in and its session is reused.
+  def _relogin(self, generation):
+    with self.session_state.lock:
+      if self.session_state.generation != generation:
+        return True
+      self.session_state.check_backoff()
+      return self.login()
+
+  # Builds the aaaLogin payload, prompting for any missing credentials
+  def _login_payload(self, username=None, password=None):
     if username is not None:
       self.username = username
     if password is not None:
@@ -201,55 +402,113 @@ class Node(object):
       self.username = input("Username: ")
     if self.__password is None:
       self.password_prompt()
-    js = {'aaaUser': {'attributes': {'name': self.username, 'pwd': self.__password}}}
-    self.__post('aaaLogin.json', js)
-    if self.response.status_code == 401:
+    return {'aaaUser': {'attributes': {'name': self.username, 'pwd': self.__password}}}
+
+  # Processes the aaaLogin response.  Returns boolean of login success
+  def _login_result(self, response):
+    if response.status_code == 401:
       print("Authentication failed.")
+      self.session_state.login_failed()
       self.clear_credentials()
       return False
-    if self.response.status_code >= 400:
-      raise Exception(f"Error {self.response.status_code} - HTTPS Request Error - Abort!")
-    self.__cookies = self.response.cookies
+    if response.status_code >= 400:
+      self.session_state.login_failed()
+      raise Exception(f"Error {response.status_code} - HTTPS Request Error - Abort!")
+    self.session_state.login_succeeded()
+    self.__cookies = response.cookies
+    self.__session_state.update(self._session_attributes(response))
     self.established = datetime.now()
+    if self.auto_refresh:
+      if self.__refresher is None:
+        self.__refresher = SessionRefresher(self)
+      self.__refresher.start()
     return True
 
+  # Reads the aaaLogin attributes (token, refreshTimeoutSeconds, ...) from an aaaLogin or aaaRefresh response
+  def _session_attributes(self, response):
+    try:
+      return response.json()['imdata'][0]['aaaLogin']['attributes']
+    except (ValueError, KeyError, IndexError, TypeError):
+      return {}
+
   # Refresh function sends a session refresh request to APIC.
   # Returns boolean of refresh success
   def refresh(self):
-    self.__post('/mo/aaaRefresh.json', {})
-    if self.response.status_code >= 400:
-      print(f"Error {self.response.status_code} - Unable to refresh session - ABORT!")
+    response = self.__post('/mo/aaaRefresh.json', {})
+    return response is not None and self._refresh_result(response)
+
+  def _refresh_result(self, response):
+    if response.status_code >= 400:
+      print(f"Error {response.status_code} - Unable to refresh session - ABORT!")
       return False
-    self.__cookies = self.response.cookies
+    self.__cookies = response.cookies
+    self.__session_state.update(self._session_attributes(response))
     return True
 
   # Logout function sends a logout request to APIC
   # Returns boolean of logout success
   def logout(self):
     payload = {'aaaUser': {'attributes': {'name': self.username}}}
-    self.__post('/mo/aaaLogout.json', payload)
-    if self.response.status_code >= 400:
-      print(f"Error {self.response.status_code} - HTTPS Request Error - ABORT!")
+    response = self.__post('/mo/aaaLogout.json', payload)
+    return response is not None and self._logout_result(response)
+
+  def _logout_result(self, response):
+    if response.status_code >= 400:
+      print(f"Error {response.status_code} - HTTPS Request Error - ABORT!")
       return False
     self.established = 0
     self.__password = None
+    self.__session_state.clear()
+    if self.__refresher is not None:
+      self.__refresher.stop()
     return True
 
   # private post function to do the real post work
   #  Path - url path (past https://<ip>/api/)
   #  Payload - The data to be posted to fabric
+  #  Returns the response (or None if the request failed), which is also kept as this context's self.response
   def __post(self, path, payload):
-    js = json.dumps(payload)
-    url = f"https://{self.address}/api/{path}"
+    js = payload if type(payload) is str else json.dumps(payload)
+    url = self._url(path)
+    self.health.check()
     try:
-      self.response = self.session.post(url, data=js, cookies=self.cookies, verify=False)
+      response = self.session.post(url, data=js, cookies=self.cookies, verify=False,
+                                   timeout=(self.connect_timeout, self.timeout))
     except Exception as e:
       print(f"Post failed. Exception {e}")
-      return False
-    return True
+      self.health.failed()
+      return None
+    self.health.succeeded()
+    self.response = response
+    return response
 
-  # Post function used to send Post messages to fabric
+  # Post function used to send Post messages to fabric.  Returns the status code.
   def post(self, path, payload=None):
+    return self.send(path, payload).status_code
+
+  # Posts to the fabric and returns the response of this post
+  def send(self, path, payload=None):
+    path, payload = self._post_target(path, payload)
+    generation = self.session_state.generation
+    response = self.__post(path, payload)
+    if response is not None and response.status_code == 403:
+      self.session_state.expire()
+      if self.auto_login:
+        if not self._relogin(generation):
+          raise Exception('Authentication failed.')
+        response = self.__post(path, payload)
+      else:
+        raise Exception('Unable to post to node. Not currently logged in and "auto_login" is disabled.')
+    if self.cache is not None:
+      self.cache.invalidate_payload(payload)
+    # Gets started before the post may return data from before it
+    self.flight.detach()
+    if response is None:
+      raise Exception(f'Post failed. Unable to post {path} to {self.address}.')
+    return response
+
+  # Resolves the path and payload for a post.  A payload alone is posted to mo.json (or mo.xml for XML strings)
+  def _post_target(self, path, payload=None):
     if payload is None:
       payload = path
       path = 'mo.json'
@@ -257,18 +516,15 @@ class Node(object):
         path = 'mo.xml'
     if isinstance(payload, Data):
       payload = payload.json
-    self.__post(path, payload)
-    if self.response.status_code == 403:
-      if self.auto_login:
-        if not self.login():
-          raise Exception('Authentication failed.')
-        self.__post(path, payload)
-      else:
-        raise Exception('Unable to post to node. Not currently logged in and "auto_login" is disabled.')
-    return self.response.status_code
+    return path, payload
 
   # Post config from a file to the apic
   def post_file(self, filename, variables=None):
+    path, cfg = self._file_payload(filename, variables)
+    return self._file_result(path, self.send(path, cfg))
+
+  # Reads a config file, substituting {{variable}}s.  Returns the path (mo.json or mo.xml) and payload to post.
+  def _file_payload(self, filename, variables=None):
     cfg = open(filename).read()
     if type(variables) is dict:
       for key in variables:
@@ -283,49 +539,161 @@ class Node(object):
     if file_type not in ['xml', 'json']:
       raise Exception('Invalid file type.  Valid options are "json" and "xml".')
     if file_type == 'json':
-      cfg = json.loads(cfg)
-      self.post('mo.json', cfg)
-    elif file_type == 'xml':
-      if cfg.count('\"') > cfg.count('\''):
-        cfg = cfg.replace('\"', '\'')
-      self.post('mo.xml', cfg)
-      if not self.response.status_code == 200:
-        print(self.response.text)
-    return self.response.status_code == 200
+      return 'mo.json', json.loads(cfg)
+    if cfg.count('\"') > cfg.count('\''):
+      cfg = cfg.replace('\"', '\'')
+    return 'mo.xml', cfg
+
+  def _file_result(self, path, response):
+    if path == 'mo.xml' and not response.status_code == 200:
+      print(response.text)
+    return response.status_code == 200
 
   # private get function to do the real get work
   #  Path - url path (past https://<ip>/api/)
   #  Parameters - Parameters to be passed to ACI with the Get request
+  #  Returns the response (or None if the request failed), which is also kept as this context's self.response
   def __get(self, path, parameters=None):
-    url = f"https://{self.address}/api/{path}"
+    url = self._url(path)
+    self.health.check()
     try:
-      self.response = self.session.get(url, params=parameters, cookies=self.cookies, verify=False)
+      response = self.session.get(url, params=parameters, cookies=self.cookies, verify=False,
+                                  timeout=(self.connect_timeout, self.timeout))
     except Exception as e:
       print(f"Query failed. Exception {e}")
-      return False
-    return True
+      self.health.failed()
+      return None
+    self.health.succeeded()
+    self.response = response
+    return response
 
   # Query fabric
   #  Path - url path
   #  Parameters - query parameters
-  def get(self, path, parameters=None):
-    self.__get(path, parameters)
-    if self.response.status_code == 403:
+  #  raw - return the undecoded response body (bytes), bypassing the cache, e.g. for lazy Data
+  # The response is handled locally so concurrent gets (e.g. paged queries) do not read each other's result
+  def get(self, path, parameters=None, raw=False):
+    if raw:
+      return self.__fetch(path, parameters, raw)
+    if self.cache is not None:
+      value = self.cache.get(path, parameters)
+      if value is None:
+        value = self._narrow(path, parameters)
+      if value is not None:
+        return value
+    return self.flight.do(Cache.key(path, parameters), lambda: self.__fetch(path, parameters))
+
+  # Sends a get (concurrent identical gets are coalesced onto one call) and caches the result
+  def __fetch(self, path, parameters, raw=False):
+    cache = self.cache if not raw else None
+    generation = cache.generation if cache is not None else None
+    request_parameters = self._request_parameters(parameters) if not raw else parameters
+    session_generation = self.session_state.generation
+    response = self.__get(path, request_parameters)
+    if response is not None and response.status_code == 403:
+      self.session_state.expire()
       if self.auto_login:
-        self.login()
-        self.__get(path, parameters)
+        self._relogin(session_generation)
+        response = self.__get(path, request_parameters)
       else:
         raise Exception('Unable to query node. Not currently logged in and "auto_login" is disabled.')
+    if response is None:
+      raise Exception(f'Query failed. Unable to get {path} from {self.address}.')
+    if raw:
+      return response.content
+    value = self._decode(path, response)
+    if cache is not None and response.status_code == 200:
+      self._cache_result(cache, generation, path, parameters, request_parameters, response, value)
+    return value
+
+  # Streams a get, yielding each object of imdata as it is parsed from the response body.
+  # Memory use is bounded by the chunk size and the largest single object.  Streamed results bypass the cache.
+  #  header - optional dictionary, populated with totalCount once it has been read
+  def stream(self, path, parameters=None, header=None, chunk_size=65536):
+    if path[-5:] != '.json':
+      raise Exception('Only json queries can be streamed.')
+    generation = self.session_state.generation
+    response = self.__open_stream(path, parameters)
+    if response is not None and response.status_code == 403:
+      response.close()
+      self.session_state.expire()
+      if not self.auto_login:
+        raise Exception('Unable to query node. Not currently logged in and "auto_login" is disabled.')
+      self._relogin(generation)
+      response = self.__open_stream(path, parameters)
+    if response is None:
+      raise Exception(f'Query failed. Unable to get {path} from {self.address}.')
+    try:
+      if response.status_code != 200:
+        raise Exception(f'Query failed. Error {response.status_code} - {response.text}')
+      parser = decoder.ImdataParser()
+      for o in decoder.iter_imdata(response.iter_content(chunk_size), parser):
+        if header is not None and parser.total_count is not None:
+          header['totalCount'] = str(parser.total_count)
+        yield o
+      if header is not None and parser.total_count is not None:
+        header['totalCount'] = str(parser.total_count)
+    finally:
+      response.close()
+
+  def __open_stream(self, path, parameters):
+    self.health.check()
+    try:
+      response = self.session.get(self._url(path), params=parameters, cookies=self.cookies, verify=False,
+                                  stream=True, timeout=(self.connect_timeout, self.timeout))
+    except Exception as e:
+      print(f"Query failed. Exception {e}")
+      self.health.failed()
+      return None
+    self.health.succeeded()
+    return response
+
+  # Answers a filtered get from the cached result of the same query without the filter, evaluating the filter
+  # locally.  Returns None if there is no such result or the filter can not be evaluated locally.
+  def _narrow(self, path, parameters):
+    if parameters is None or 'query-target-filter' not in parameters or 'page-size' in parameters:
+      return None
+    superset = dict(parameters)
+    expression = superset.pop('query-target-filter')
+    content = self.cache.get(path, superset if len(superset) > 0 else None)
+    if type(content) is not dict or 'imdata' not in content:
+      return None
+    try:
+      return filters.narrow(content, expression)
+    except Exception:
+      return None
+
+  # Parameters sent for a get.  Results that will be cached are subscribed to when subscriptions are running.
+  def _request_parameters(self, parameters):
+    if self.cache is None or self.subscriptions is None or not self.subscriptions.running:
+      return parameters
+    return dict(parameters if parameters is not None else {}, subscription='yes')
+
+  # Stores a get result in the cache and registers its subscription, if one was requested
+  def _cache_result(self, cache, generation, path, parameters, request_parameters, response, value):
+    subscription_id = None
+    if request_parameters is not parameters and type(value) is dict:
+      subscription_id = value.get('subscriptionId')
+    stored = cache.put(path, parameters, value, len(response.content), generation, subscription_id)
+    if stored and subscription_id is not None:
+      self.subscriptions.subscribe(subscription_id, cache.apply)
+
+  # Builds the full url for an api path
+  def _url(self, path):
+    return f"https://{self.address}/api/{path.lstrip('/')}"
+
+  # Decodes a get response based on the requested path.  JSON bodies are parsed from the raw bytes.
+  def _decode(self, path, response):
     if path[-5:] == '.json':
-      return json.loads(self.response.text)
-    return self.response.text
+      return decoder.loads(response.content)
+    return response.text
 
   # Creates a Query object associated with the current fabric with provided parameters
   def query(self, path=None, filter=None, target=None, target_class=None, include=None, subtree=None, subtree_class=None,
-            subtree_filter=None, subtree_include=None, order=None):
+            subtree_filter=None, subtree_include=None, order=None, page_size=None):
     return Query(self, path=path, filter=filter, target=target, target_class=target_class, include=include,
                   subtree=subtree, subtree_class=subtree_class, subtree_filter=subtree_filter,
-                  subtree_include=subtree_include, order=order)
+                  subtree_include=subtree_include, order=order, page_size=page_size)
   
   # Creates a Querry object and runs it 
   def qr(self, *args, **kwargs):
@@ -336,10 +704,10 @@ class Node(object):
     if not type(dn) == str:
       if hasattr(dn, 'dn'):
         dn = dn.dn
-    else:
-      raise Exception('Invalid object type.  Must be string or a class object with a dn property.')
+      else:
+        raise Exception('Invalid object type.  Must be string or a class object with a dn property.')
     data = self.query(dn, include='naming-only').run()
-    if data.count == '0':
+    if data.count == 0:
       return False
     if 'error' in data.imdata[0].keys():
       return False
@@ -347,18 +715,16 @@ class Node(object):
 
   # return the class of an object from its dn
   def get_class(self, dn):
-    dn = dn.lstrip('mo/').rstrip('.json').rstrip('.xml')
+    dn = path_dn(dn)
     if not self.exists(dn):
       raise Exception('%s does not exist or is not a valid dn.' % dn)
     data= self.query('mo/%s.json' % dn).run()
     return list(data.imdata[0].keys())[0]
 
   def remove_object(self, dn):
-    js = self.query(dn, include='naming').run().imdata[0]
-    js[list(js.keys())[0]]['attributes']['status'] = 'deleted'
-    self.post(js)
-    if self.response.status_code != 200:
-      print(self.response.text)
+    response = self.send(fabric.deleted_payload(self.query(dn, include='naming').run()))
+    if response.status_code != 200:
+      print(response.text)
 
   def interface(self, ifc):
     return Interface(self, ifc)
@@ -369,6 +735,10 @@ class Node(object):
     else:
       ifc = Interface(self, ifc)
       nbrs = self.query(f'{self.dn}/cdp/inst/if-[{ifc.id}]', target='subtree', target_class='cdpAdjEp').run()
+    return self._cdp_list(nbrs)
+
+  # Neighbor list of a cdpAdjEp query result
+  def _cdp_list(self, nbrs):
     nbrs = nbrs.attribute(['dn', 'devId', 'portId'], keys=True)
     lst = []
     for d in nbrs:
@@ -391,6 +761,10 @@ class Node(object):
     else:
       ifc = Interface(self, ifc)
       nbrs = self.query(f'{self.dn}/lldp/inst/if-[{ifc.id}]', target='subtree', target_class='lldpAdjEp').run()
+    return self._lldp_list(nbrs)
+
+  # Neighbor list of an lldpAdjEp query result
+  def _lldp_list(self, nbrs):
     nbrs = nbrs.attribute(['dn', 'sysName', 'portIdV'], True)
     lst = []
     for d in nbrs:
@@ -1,23 +1,29 @@
 import node
 import json
 import data
+import filters
+from concurrent.futures import ThreadPoolExecutor   # Thread pool used to fetch query pages concurrently
 
 
 # Query object used to create, manage, and review a fabric/leaf/spine query
 class Query(object):
   def __init__(self, the_node, path=None, target=None, target_class=None, filter=None, include=None, subtree=None,
-                subtree_class=None, subtree_filter=None, subtree_include=None, order=None):
+                subtree_class=None, subtree_filter=None, subtree_include=None, order=None, page_size=None, workers=4):
     self.__node = None
     self.__path = None
     self.__target = None
     self.__target_class = None
     self.__filter = None
+    self.__shortcut = None
+    self.__resolved = None
     self.__include = None
     self.__subtree = None
     self.__subtree_class = None
     self.__subtree_filter = None
     self.__subtree_include = None
     self.__order = None
+    self.__page_size = None
+    self.__workers = None
     self.__data = None
     self.parameters = None
     self.node = the_node
@@ -31,6 +37,8 @@ class Query(object):
     self.subtree_filter = subtree_filter
     self.subtree_include = subtree_include
     self.order = order
+    self.page_size = page_size
+    self.workers = workers
 
   @property
   def node(self):
@@ -74,10 +82,13 @@ class Query(object):
   def count(self):
     return self.__data.count
 
+  def _set_data(self, data):
+    self.__data = data
+
   @property
   def output_class(self):
     if self.path[:6] == 'class/':
-      return self.path.lstrip('class/').rstrip('.json').rstrip('.xml')
+      return self.path[6:self.path.rfind('.')]
     else:
       return self.node.get_class(self.path)
 
@@ -101,17 +112,37 @@ class Query(object):
       raise Exception('Invalid target class provided.  Must be of type str or None.')
     self.__target_class = target_class
 
+  # Filters are held in canonical form (see filters.py), so identical filters give identical query parameters.
+  # An "attribute=value" filter is resolved against the output class when the filter is read, not when it is set,
+  # since resolving the class of an mo path requires a query.
   @property
   def filter(self):
-    return self.__filter
+    if self.__shortcut is None:
+      return self.__filter
+    if self.__resolved is None or self.__resolved[0] != self.path:
+      self._resolve_filter(self.output_class)
+    return self.__resolved[1]
 
   @filter.setter
   def filter(self, filter):
-    if not (filter is None or type(filter) == str):
-      raise Exception('Invalid filter provided.  Must be of type str or None.')
-    self.__filter = filter
-    if type(filter) == str and filter.count('=') == 1:
-      self.__filter = f'eq({self.output_class}.{filter.split("=")[0]}, "{filter.split("=")[1].lstrip()}")'
+    if not (filter is None or type(filter) == str or isinstance(filter, filters.Condition)):
+      raise Exception('Invalid filter provided.  Must be of type str, filters.Condition or None.')
+    self.__shortcut = None
+    self.__resolved = None
+    if type(filter) == str and filter.count('=') == 1 and '(' not in filter:
+      self.__shortcut = tuple(o.strip() for o in filter.split('='))
+      filter = None
+    self.__filter = filters.canonical(filter) if filter is not None else None
+
+  # (attribute, value) of an unresolved "attribute=value" filter, or None
+  @property
+  def filter_shortcut(self):
+    return self.__shortcut
+
+  # Resolves an "attribute=value" filter against the class cls
+  def _resolve_filter(self, cls):
+    attribute, value = self.__shortcut
+    self.__resolved = (self.path, str(filters.F.eq(f'{cls}.{attribute}', value)))
 
   @property
   def include(self):
@@ -160,10 +191,10 @@ class Query(object):
   @subtree_filter.setter
   def subtree_filter(self, subtree_filter):
     if subtree_filter == '':
-      self.__subtree_filter = None
-    if not (subtree_filter is None or type(subtree_filter) is str):
-      raise Exception('Invalid subtree filter.  Must be type String or None.')
-    self.__subtree_filter = subtree_filter
+      subtree_filter = None
+    if not (subtree_filter is None or type(subtree_filter) is str or isinstance(subtree_filter, filters.Condition)):
+      raise Exception('Invalid subtree filter.  Must be type String, filters.Condition or None.')
+    self.__subtree_filter = filters.canonical(subtree_filter) if subtree_filter is not None else None
 
   @property
   def subtree_include(self):
@@ -187,6 +218,36 @@ class Query(object):
         raise Exception('Invalid option for rsp_include.  Options are count, no-scoped, and required.')
     self.__subtree_include = subtree_include
 
+  @property
+  def page_size(self):
+    return self.__page_size
+
+  @page_size.setter
+  def page_size(self, page_size):
+    if page_size is not None and (type(page_size) is not int or page_size < 1):
+      raise Exception('Invalid page size.  Must be a positive integer or None.')
+    self.__page_size = page_size
+
+  @property
+  def workers(self):
+    return self.__workers
+
+  @workers.setter
+  def workers(self, workers):
+    if type(workers) is not int or workers < 1:
+      raise Exception('Invalid worker count.  Must be a positive integer.')
+    self.__workers = workers
+
+  # Number of pages needed for totalCount objects at the current page size
+  def page_count(self, total_count):
+    return max(1, -(-int(total_count) // self.page_size))
+
+  # Query parameters for a single page of the query
+  def page_parameters(self, page):
+    parameters = self.parameters
+    parameters.update({'page': page, 'page-size': self.page_size})
+    return parameters
+
   @property
   def parameters(self):
     parameters = {}
@@ -226,7 +287,8 @@ class Query(object):
     self.subtree_include = parameters['rsp-subtree-include'] if 'rsp-subtree-include' in parameters else None
     self.order = parameters['order-by'] if 'order-by' in parameters else None
 
-  def run(self, path=None, show_output=False, show_parameters=False, show_count=False):
+  # lazy - keep the response body undecoded and decode attributes on access (see data.Data).  Bypasses the cache.
+  def run(self, path=None, show_output=False, show_parameters=False, show_count=False, lazy=False):
     if path is not None:
       self.path = path
     if path is not None and type(path) is not str:
@@ -235,13 +297,77 @@ class Query(object):
       raise Exception('Path has not been set.')
     if show_parameters:
       print(json.dumps(self.parameters, indent=2))
-    self.__data = data.Data(self.node.get(self.path, self.parameters))
+    if lazy:
+      if self.page_size is not None:
+        raise Exception('Paged queries can not be run lazily.')
+      self.__data = data.Data(self.node.get(self.path, self.parameters, raw=True), lazy=True)
+    elif self.page_size is None:
+      self.__data = data.Data(self.node.get(self.path, self.parameters))
+    else:
+      self.__data = self.__run_pages()
     if show_count:
       print(self.data.count)
     if show_output:
       self.data.print()
     return self.data
 
+  # Runs one query for several classes and returns a Data per class.  The classes are set as the target subtree
+  # classes (in sorted order, so equal batches share cache entries), with a subtree target unless one is set.
+  #  classes - classes to fetch.  Defaults to the target subtree classes already set.
+  def run_batch(self, classes=None):
+    classes = self.batch_classes(classes)
+    return self.run().split(classes)
+
+  # Sets up the query for a batch of classes and returns the classes
+  def batch_classes(self, classes=None):
+    if classes is None:
+      if self.target_class is None:
+        raise Exception('No classes provided for the batch query.')
+      classes = self.target_class.split(',')
+    classes = sorted(set(c.strip() for c in classes))
+    self.target_class = ','.join(classes)
+    if self.target is None:
+      self.target = 'subtree'
+    return classes
+
+  # Fetches page 0 to learn the totalCount, then the remaining pages concurrently, and merges them into one Data
+  # The APIC does not guarantee a stable order between pages unless "order" is set on the query.
+  def __run_pages(self):
+    first = self.__get_page(0)
+    pages = self.page_count(first['totalCount'])
+    imdata = list(first['imdata'])
+    if pages > 1:
+      with ThreadPoolExecutor(max_workers=min(self.workers, pages - 1)) as pool:
+        for page in pool.map(self.__get_page, range(1, pages)):
+          imdata.extend(page['imdata'])
+    return data.Data({'totalCount': first['totalCount'], 'imdata': imdata})
+
+  def __get_page(self, page):
+    return self.node.get(self.path, self.page_parameters(page))
+
+  # Generator yielding a Data object for each page of the query, so results can be processed a page at a time
+  def iter_pages(self, page_size=None):
+    if page_size is not None:
+      self.page_size = page_size
+    if self.path is None:
+      raise Exception('Path has not been set.')
+    if self.page_size is None:
+      raise Exception('Page size has not been set.')
+    page = 0
+    pages = 1
+    while page < pages:
+      content = self.__get_page(page)
+      pages = self.page_count(content['totalCount'])
+      yield data.Data(content)
+      page += 1
+
+  # Generator yielding each object of the query result as it is parsed from the response, without holding
+  # the full result in memory.  header, if provided, is populated with totalCount.
+  def stream(self, header=None):
+    if self.path is None:
+      raise Exception('Path has not been set.')
+    yield from self.node.stream(self.path, self.parameters, header)
+
   def reset(self):
     self.path = None
     self.parameters = None
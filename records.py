@@ -0,0 +1,59 @@
+import collections   # collections module for the tuple backed record types
+
+
+# Attributes kept in the record of each class, in record order.  Classes not listed here need the
+# attributes to be given when their record type is created.
+SCHEMA = {
+  'fvTenant': ('name', 'nameAlias', 'descr', 'dn'),
+  'fvCtx': ('name', 'nameAlias', 'descr', 'dn', 'pcEnfPref', 'pcEnfDir', 'pcTag', 'scope', 'knwMcastAct'),
+  'fvBD': ('name', 'nameAlias', 'descr', 'dn', 'arpFlood', 'unicastRoute', 'unkMacUcastAct', 'unkMcastAct',
+           'limitIpLearnToSubnets', 'epMoveDetectMode', 'mac', 'type', 'pcTag', 'scope'),
+  'fvAp': ('name', 'nameAlias', 'descr', 'dn', 'prio'),
+  'fvAEPg': ('name', 'nameAlias', 'descr', 'dn', 'pcTag', 'scope', 'prefGrMemb', 'floodOnEncap', 'isAttrBasedEPg',
+             'pcEnfPref', 'prio'),
+  'fabricNode': ('id', 'name', 'role', 'address', 'model', 'serial', 'version', 'vendor', 'nodeType', 'fabricSt',
+                 'adSt', 'dn'),
+}
+
+# Generated record types by (class, attributes)
+types = {}
+
+
+# Base of the generated record types.  Records are tuples of attribute values (None where the object did
+# not have the attribute), so they carry no per object dict: attributes are read by name (record.dn), by
+# index or by unpacking.
+class Record(object):
+  __slots__ = ()
+  aci_class = None
+  attributes = ()
+
+  # Attribute dict of the record.  fields, if given, maps output keys to attribute names.
+  def as_dict(self, fields=None):
+    values = dict(zip(self.attributes, self))
+    if fields is None:
+      return values
+    return {key: values[att] for key, att in fields.items()}
+
+  # Record of an APIC object, e.g. {'fvTenant': {'attributes': {...}}}
+  @classmethod
+  def from_object(cls, o):
+    attributes = o[cls.aci_class].get('attributes', {})
+    return cls._make(attributes.get(att) for att in cls.attributes)
+
+
+# Returns the record type of an ACI class, generated on first use.
+#  attributes - attributes of the record.  Defaults to the class SCHEMA entry.
+def record_type(aci_class, attributes=None):
+  if attributes is None:
+    if aci_class not in SCHEMA:
+      raise Exception(f'No record schema for class {aci_class}.  Provide the attributes of the record.')
+    attributes = SCHEMA[aci_class]
+  attributes = tuple(attributes)
+  key = (aci_class, attributes)
+  rt = types.get(key)
+  if rt is None:
+    # rename replaces attribute names that are not identifiers; values remain available by index and as_dict
+    base = collections.namedtuple(aci_class, attributes, rename=True)
+    rt = type(aci_class, (base, Record), {'__slots__': (), 'aci_class': aci_class, 'attributes': attributes})
+    types[key] = rt
+  return rt
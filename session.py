@@ -0,0 +1,161 @@
+import asyncio      # asyncio module for refreshing AsyncNode sessions on the event loop
+import random       # random module for refresh jitter
+import threading    # threading module for the background refresh thread
+import time         # time module for session expiry
+
+
+# SessionState tracks an APIC session locally from the aaaLogin/aaaRefresh responses,
+# so the validity of a session can be checked without a request.
+# It also serializes logins: callers recovering from a 403 take the login lock, and skip the login if
+# the generation changed while they waited (another caller already logged in).  Failed logins start a
+# shared backoff so a burst of callers does not repeat a failing aaaLogin.
+#  backoff - seconds to wait after the first failed login, doubled for each further failure up to max_backoff
+class SessionState(object):
+  def __init__(self, backoff=1, max_backoff=60):
+    self.token = None
+    self.refresh_timeout = None
+    self.maximum_lifetime = None
+    self.expires = None
+    self.generation = 0
+    self.failures = 0
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.lock = threading.RLock()
+    self.async_lock = asyncio.Lock()
+    self.__backoff_until = 0
+
+  # A copied node keeps no session of its own
+  def __deepcopy__(self, memo):
+    return SessionState(self.backoff, self.max_backoff)
+
+  def login_succeeded(self):
+    self.generation += 1
+    self.failures = 0
+    self.__backoff_until = 0
+
+  def login_failed(self):
+    self.failures += 1
+    delay = min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+    self.__backoff_until = time.monotonic() + delay
+
+  # Seconds remaining before another automatic login may be attempted
+  @property
+  def backoff_remaining(self):
+    return max(0, self.__backoff_until - time.monotonic())
+
+  # Raises if automatic logins are backing off after a failure
+  def check_backoff(self):
+    remaining = self.backoff_remaining
+    if remaining > 0:
+      raise Exception(f'Authentication failed.  Login retry is backing off for {remaining:.1f} seconds.')
+
+  # Updates the state from the attributes of an aaaLogin object
+  def update(self, attributes):
+    self.token = attributes.get('token', self.token)
+    if 'refreshTimeoutSeconds' in attributes:
+      self.refresh_timeout = int(attributes['refreshTimeoutSeconds'])
+    if 'maximumLifetimeSeconds' in attributes:
+      self.maximum_lifetime = int(attributes['maximumLifetimeSeconds'])
+    self.expires = time.monotonic() + self.refresh_timeout if self.refresh_timeout is not None else None
+
+  # Marks the session as no longer valid, e.g. after a 403 response or a logout
+  def expire(self):
+    self.expires = None
+
+  def clear(self):
+    self.token = None
+    self.expires = None
+
+  @property
+  def valid(self):
+    return self.token is not None and self.expires is not None and time.monotonic() < self.expires
+
+  # Seconds until the session expires
+  @property
+  def remaining(self):
+    if self.expires is None:
+      return 0
+    return max(0, self.expires - time.monotonic())
+
+
+# SessionRefresher refreshes a node's session before it expires.
+# Refreshes are scheduled at a random point between 60% and 80% of the refresh timeout, so several
+# processes sharing credentials do not refresh in lock step.  A failed refresh stops the refresher;
+# the next request then logs in again through the normal 403 handling, which restarts it.
+class SessionRefresher(object):
+  def __init__(self, node, low=0.6, high=0.8):
+    self.node = node
+    self.low = low
+    self.high = high
+    self.refreshes = 0
+    self.failures = 0
+    self.__stop = threading.Event()
+    self.__thread = None
+    self.__task = None
+
+  # A copied node starts its own refresher on login
+  def __deepcopy__(self, memo):
+    return None
+
+  @property
+  def running(self):
+    if self.__task is not None:
+      return not self.__task.done()
+    return self.__thread is not None and self.__thread.is_alive()
+
+  # Seconds until the next refresh
+  def delay(self):
+    timeout = self.node.session_state.refresh_timeout
+    if timeout is None:
+      return None
+    return timeout * random.uniform(self.low, self.high)
+
+  # Starts the refresher if it is not running.  AsyncNode sessions are refreshed by a task on the running event loop.
+  def start(self):
+    if self.running:
+      return
+    self.__stop.clear()
+    if asyncio.iscoroutinefunction(self.node.refresh):
+      self.__task = asyncio.get_running_loop().create_task(self.__run_async())
+    else:
+      self.__thread = threading.Thread(target=self.__run, daemon=True)
+      self.__thread.start()
+
+  def stop(self):
+    self.__stop.set()
+    if self.__task is not None:
+      self.__task.cancel()
+      self.__task = None
+
+  def __result(self, refreshed):
+    if refreshed:
+      self.refreshes += 1
+    else:
+      self.failures += 1
+      self.node.session_state.expire()
+    return refreshed
+
+  def __run(self):
+    delay = self.delay()
+    while delay is not None and not self.__stop.wait(delay):
+      try:
+        refreshed = self.node.refresh()
+      except Exception as e:
+        print(f"Session refresh failed. Exception {e}")
+        refreshed = False
+      if not self.__result(refreshed):
+        return
+      delay = self.delay()
+
+  async def __run_async(self):
+    delay = self.delay()
+    while delay is not None and not self.__stop.is_set():
+      await asyncio.sleep(delay)
+      try:
+        refreshed = await self.node.refresh()
+      except Exception as e:
+        print(f"Session refresh failed. Exception {e}")
+        refreshed = False
+      if not self.__result(refreshed):
+        return
+      delay = self.delay()
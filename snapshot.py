@@ -0,0 +1,298 @@
+import gzip         # gzip module for the compressed snapshot file
+import json         # JSON module to write the snapshot file
+import time         # time module for the snapshot age
+import asyncio      # asyncio module to pull a snapshot through an AsyncNode concurrently
+
+import ip
+import node
+import data
+import decoder
+import filters
+from cache import path_dn
+
+
+# Subtrees pulled into a snapshot by default: the policy universe
+ROOTS = ('uni',)
+
+# Classes pulled into a snapshot by default.  Class queries are only answered for these; fvTenant (also under uni)
+# is listed so tenant lists can be served.
+CLASSES = ('fvTenant', 'fabricNode', 'topSystem', 'infraCont', 'fvCEp', 'fvIp', 'vlanCktEp', 'l1PhysIf', 'ethpmFcot',
+           'lldpAdjEp', 'cdpAdjEp', 'faultInst')
+
+# Snapshot file format version
+VERSION = 1
+
+
+# dn of the parent of an object.  rns may hold "/" inside brackets, e.g. .../rspathAtt-[topology/pod-1/paths-101/pathep-[eth1/1]]
+def parent_dn(dn):
+  depth = 0
+  for i in range(len(dn) - 1, -1, -1):
+    if dn[i] == ']':
+      depth += 1
+    elif dn[i] == '[':
+      depth -= 1
+    elif dn[i] == '/' and depth == 0:
+      return dn[:i]
+  return None
+
+
+# Snapshot of part of a fabric's object tree, stored flat by dn.
+# A snapshot holds the full subtrees of its roots and every object of its classes.  get answers Node.get
+# requests (class and mo queries with their query parameters) from the stored objects with the same output
+# as the APIC, evaluating filters locally (see filters.py).  Requests for classes or dns outside the snapshot
+# raise an exception.
+class Snapshot(object):
+  def __init__(self, address=None, roots=(), classes=(), created=None):
+    self.address = address
+    self.roots = list(roots)
+    self.classes = list(classes)
+    self.created = created if created is not None else time.time()
+    self.__objects = {}
+    self.__class_index = None
+    self.__children = None
+
+  # Snapshots are read-only, so copied nodes share the snapshot
+  def __deepcopy__(self, memo):
+    return self
+
+  @property
+  def age(self):
+    return time.time() - self.created
+
+  @property
+  def count(self):
+    return len(self.__objects)
+
+  # Adds the objects of a query result (imdata), including nested children, to the snapshot
+  def add(self, imdata, parent=None):
+    stack = [(o, parent) for o in reversed(imdata)]
+    while len(stack) > 0:
+      o, parent = stack.pop()
+      cls = next(iter(o))
+      body = o[cls]
+      attributes = dict(body.get('attributes', {}))
+      dn = attributes.get('dn')
+      if dn is None and parent is not None and 'rn' in attributes:
+        dn = attributes['dn'] = f'{parent}/{attributes["rn"]}'
+      if dn is None:
+        continue
+      self.__objects[dn] = (cls, attributes)
+      for child in reversed(body.get('children', [])):
+        stack.append((child, dn))
+    self.__class_index = None
+    self.__children = None
+
+  def __build_index(self):
+    classes = {}
+    children = {}
+    for dn, (cls, _) in self.__objects.items():
+      classes.setdefault(cls, []).append(dn)
+      parent = parent_dn(dn)
+      if parent is not None:
+        children.setdefault(parent, []).append(dn)
+    self.__class_index = classes
+    self.__children = children
+
+  # True if every object of the class is in the snapshot, i.e. the class was pulled explicitly.  Objects of a class
+  # found under a root may be only some of its objects: the class may also live outside the roots.
+  def covers_class(self, cls):
+    return cls in self.classes
+
+  # True if the object with the dn, if it exists, is in the snapshot
+  def covers_dn(self, dn):
+    return dn in self.__objects or any(dn == root or dn.startswith(root + '/') for root in self.roots)
+
+  # dns of the object and all of its descendants, parents first
+  def __subtree(self, dn):
+    dns = []
+    stack = [dn]
+    while len(stack) > 0:
+      dn = stack.pop()
+      dns.append(dn)
+      stack.extend(reversed(self.__children.get(dn, [])))
+    return dns
+
+  # Builds the response object of a dn.  With subtree_classes or a subtree_filter, children are only kept if they
+  # are of one of the classes and match the filter, or (for a full subtree) have kept descendants.
+  def __build(self, dn, subtree, subtree_classes, subtree_filter, include):
+    cls, attributes = self.__objects[dn]
+    if include == 'naming-only':
+      attributes = {att: val for att, val in attributes.items() if att in ['dn', 'name']}
+    body = {'attributes': dict(attributes)}
+    if subtree in ['children', 'full']:
+      children = []
+      for child in self.__children.get(dn, []):
+        o = self.__build(child, 'full' if subtree == 'full' else 'no', subtree_classes, subtree_filter, include)
+        child_cls = next(iter(o))
+        if 'children' in o[child_cls] or ((subtree_classes is None or child_cls in subtree_classes) and
+                                           (subtree_filter is None or subtree_filter.evaluate(*self.__objects[child]))):
+          children.append(o)
+      if len(children) > 0:
+        body['children'] = children
+    return {cls: body}
+
+  # Answers a Node.get request.  Returns the decoded JSON response (totalCount and imdata).
+  def get(self, path, parameters=None):
+    parameters = parameters if parameters is not None else {}
+    if self.__class_index is None:
+      self.__build_index()
+    if path.lstrip('/')[:6] == 'class/':
+      cls = path_dn(path.lstrip('/')[6:])
+      if not self.covers_class(cls):
+        raise Exception(f'Class {cls} is not in the snapshot.')
+      dns = list(self.__class_index.get(cls, []))
+    else:
+      dn = path_dn(path)
+      target_classes = parameters.get('target-subtree-class', '').split(',')
+      if self.covers_dn(dn):
+        dns = [dn] if dn in self.__objects else []
+      elif parameters.get('query-target') == 'subtree' and all(cls in self.classes for cls in target_classes):
+        # Subtree queries for classes pulled in full are answered from the class index
+        dns = [o for cls in target_classes for o in self.__class_index.get(cls, []) if o.startswith(dn + '/')]
+        parameters = dict(parameters, **{'query-target': 'self'})
+      else:
+        raise Exception(f'{dn} is not in the snapshot.')
+    target = parameters.get('query-target', 'self')
+    if target == 'children':
+      dns = [child for dn in dns for child in self.__children.get(dn, [])]
+    elif target == 'subtree':
+      dns = [o for dn in dns for o in self.__subtree(dn)]
+    if 'target-subtree-class' in parameters:
+      classes = parameters['target-subtree-class'].split(',')
+      dns = [dn for dn in dns if self.__objects[dn][0] in classes]
+    if 'query-target-filter' in parameters:
+      condition = filters.parse(parameters['query-target-filter'])
+      dns = [dn for dn in dns if condition.evaluate(*self.__objects[dn])]
+    if 'order-by' in parameters:
+      for order in reversed(parameters['order-by'].split(',')):
+        attribute = order.split('|')[0].split('.')[-1]
+        descending = order.endswith('|desc')
+        dns.sort(key=lambda dn: self.__objects[dn][1].get(attribute, ''), reverse=descending)
+    total = len(dns)
+    if 'page-size' in parameters:
+      size = int(parameters['page-size'])
+      start = int(parameters.get('page', 0)) * size
+      dns = dns[start:start + size]
+    subtree = parameters.get('rsp-subtree', 'no')
+    subtree_classes = parameters['rsp-subtree-class'].split(',') if 'rsp-subtree-class' in parameters else None
+    subtree_filter = filters.parse(parameters['rsp-subtree-filter']) if 'rsp-subtree-filter' in parameters else None
+    include = parameters.get('rsp-prop-include')
+    return {'totalCount': str(total),
+            'imdata': [self.__build(dn, subtree, subtree_classes, subtree_filter, include) for dn in dns]}
+
+  # Writes the snapshot to a gzip compressed file
+  def save(self, path):
+    content = {
+      'version': VERSION, 'created': self.created, 'address': self.address, 'roots': self.roots,
+      'classes': self.classes, 'objects': [[cls, attributes] for cls, attributes in self.__objects.values()]
+    }
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+      json.dump(content, f, separators=(',', ':'))
+
+  @staticmethod
+  def load(path):
+    with gzip.open(path, 'rb') as f:
+      content = decoder.loads(f.read())
+    if content.get('version') != VERSION:
+      raise Exception(f'Unsupported snapshot version {content.get("version")} in {path}.')
+    snap = Snapshot(content['address'], content['roots'], content['classes'], content['created'])
+    snap.add([{cls: {'attributes': attributes}} for cls, attributes in content['objects']])
+    return snap
+
+
+# Pulls the full subtree of each root and every object of each class from a fabric into a Snapshot, one query
+# per root and class (or per page of a class, with page_size).  The snapshot is saved to path, if provided.
+def take(fab, path=None, roots=ROOTS, classes=CLASSES, page_size=None):
+  snap = Snapshot(fab.apic.address, roots, classes)
+  for root in roots:
+    snap.add(fab.query(f'mo/{root}', subtree='full').run().imdata)
+  for cls in classes:
+    snap.add(fab.query(cls, page_size=page_size).run().imdata)
+  if path is not None:
+    snap.save(path)
+  return snap
+
+
+# take for a fabric of AsyncNodes.  The queries run concurrently.
+async def take_async(fab, path=None, roots=ROOTS, classes=CLASSES, page_size=None):
+  snap = Snapshot(fab.apic.address, roots, classes)
+  queries = [fab.query(f'mo/{root}', subtree='full') for root in roots]
+  queries += [fab.query(cls, page_size=page_size) for cls in classes]
+  for result in await asyncio.gather(*[query.run() for query in queries]):
+    snap.add(result.imdata)
+  if path is not None:
+    snap.save(path)
+  return snap
+
+
+# Read-only node answering queries from a Snapshot (or a snapshot file), with the same Data output as the APIC.
+# Posts raise an exception.  No connection or login is made.
+class SnapshotNode(node.Node):
+  def __init__(self, snapshot, parent_fabric=None):
+    if not isinstance(snapshot, Snapshot):
+      snapshot = Snapshot.load(snapshot)
+    self.__snapshot = snapshot
+    self.__address = None
+    node.Node.__init__(self, snapshot.address, parent_fabric=parent_fabric, auto_login=False)
+
+  @property
+  def snapshot(self):
+    return self.__snapshot
+
+  # The address is only recorded; it is not checked, and a hostname is resolved only if it is in the resolver cache
+  @property
+  def address(self):
+    return self.__address
+
+  @address.setter
+  def address(self, address):
+    self.__address = address
+    if address is not None and not ip.is_ip(address):
+      address = ip.resolver.lookup(address)[1]
+    if address is not None:
+      self.ip = address
+
+  @property
+  def login_status(self):
+    return True
+
+  def check_connection(self):
+    return True
+
+  def login(self, username=None, password=None):
+    return True
+
+  def refresh(self):
+    return True
+
+  def logout(self):
+    return True
+
+  # Handles of other nodes answer from the same snapshot
+  def handle(self, address, **kwargs):
+    handle = SnapshotNode(self.snapshot, self.fabric)
+    handle.address = address
+    return handle
+
+  def get(self, path, parameters=None, raw=False):
+    content = self.snapshot.get(path, parameters)
+    if raw:
+      return json.dumps(content).encode()
+    if path[-4:] == '.xml':
+      return data.json_to_xml(content)
+    return content
+
+  def stream(self, path, parameters=None, header=None, chunk_size=65536):
+    content = self.snapshot.get(path, parameters)
+    if header is not None:
+      header['totalCount'] = content['totalCount']
+    yield from content['imdata']
+
+  def send(self, path, payload=None):
+    raise Exception('Snapshots are read-only.  Unable to post to a snapshot.')
+
+  def post(self, path, payload=None):
+    return self.send(path, payload)
+
+  def post_file(self, filename, variables=None):
+    return self.send(filename)
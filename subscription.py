@@ -0,0 +1,150 @@
+import json         # JSON module for decoding pushed events
+import threading    # threading module for the websocket reader and refresh threads
+import requests     # Requests module used for subscription refresh calls
+
+
+# SubscriptionManager keeps query subscriptions alive on an APIC and dispatches pushed events.
+# Queries run with subscription=yes return a subscriptionId.  The APIC then pushes create/modify/delete
+# events for the results over a websocket at /socket<token> until the subscription is not refreshed.
+#  node - the Node whose session token is used
+#  refresh_interval - seconds between subscriptionRefresh calls (the APIC expires subscriptions after 90 seconds)
+#  connect - optional function taking a url and returning a websocket-like object with recv() and close()
+class SubscriptionManager(object):
+  def __init__(self, node, refresh_interval=45, connect=None):
+    self.node = node
+    self.refresh_interval = refresh_interval
+    self.__connect = connect
+    self.__callbacks = {}
+    self.__lock = threading.RLock()
+    self.__socket = None
+    self.__running = False
+    self.__stop = threading.Event()
+    self.__threads = []
+    self.session = requests.session()
+
+  # A copied node does not inherit the subscriptions of the original
+  def __deepcopy__(self, memo):
+    return None
+
+  @property
+  def connected(self):
+    return self.__socket is not None
+
+  @property
+  def running(self):
+    return self.__running
+
+  @property
+  def subscription_ids(self):
+    with self.__lock:
+      return list(self.__callbacks)
+
+  def __open(self):
+    if self.node.token is None:
+      raise Exception('Unable to open subscription socket.  Node is not logged in.')
+    url = f'wss://{self.node.address}/socket{self.node.token}'
+    if self.__connect is not None:
+      return self.__connect(url)
+    import ssl          # ssl module used to skip certificate validation, as with all fabric requests
+    import websocket    # websocket-client module, only required when subscriptions are used
+    return websocket.create_connection(url, sslopt={'cert_reqs': ssl.CERT_NONE})
+
+  # Opens the websocket and starts the reader and refresh threads
+  def start(self):
+    if self.__running:
+      return
+    self.__socket = self.__open()
+    self.__running = True
+    self.__stop.clear()
+    self.__threads = [threading.Thread(target=self.__read_loop, daemon=True),
+                      threading.Thread(target=self.__refresh_loop, daemon=True)]
+    for thread in self.__threads:
+      thread.start()
+
+  def stop(self):
+    self.__running = False
+    self.__stop.set()
+    self.__close()
+    self.__drop_all()
+
+  def __close(self):
+    socket = self.__socket
+    self.__socket = None
+    if socket is not None:
+      try:
+        socket.close()
+      except Exception:
+        pass
+
+  # Registers a callback for a subscription id.
+  # callback(subscription_id, imdata) is called with the pushed objects, or with None when the subscription is lost.
+  # A callback returning False indicates the subscription is no longer needed and it will not be refreshed.
+  def subscribe(self, subscription_id, callback):
+    with self.__lock:
+      self.__callbacks[str(subscription_id)] = callback
+
+  def unsubscribe(self, subscription_id):
+    with self.__lock:
+      return self.__callbacks.pop(str(subscription_id), None) is not None
+
+  # Dispatches one websocket message to the callbacks of its subscription ids
+  def handle(self, message):
+    if type(message) in [str, bytes]:
+      message = json.loads(message)
+    ids = message.get('subscriptionId', [])
+    if type(ids) is not list:
+      ids = [ids]
+    for subscription_id in ids:
+      with self.__lock:
+        callback = self.__callbacks.get(str(subscription_id))
+      if callback is not None and callback(str(subscription_id), message.get('imdata', [])) is False:
+        self.unsubscribe(subscription_id)
+
+  # Refreshes every subscription still in use.  Subscriptions the APIC no longer knows are reported as lost.
+  def refresh(self):
+    for subscription_id in self.subscription_ids:
+      with self.__lock:
+        callback = self.__callbacks.get(subscription_id)
+      if callback is None:
+        continue
+      if callback(subscription_id, []) is False:
+        self.unsubscribe(subscription_id)
+        continue
+      try:
+        response = self.session.get(self.node._url('subscriptionRefresh.json'), params={'id': subscription_id},
+                                    cookies={'APIC-cookie': self.node.token}, verify=False, timeout=10)
+        lost = response.status_code != 200
+      except Exception:
+        lost = True
+      if lost:
+        self.unsubscribe(subscription_id)
+        callback(subscription_id, None)
+
+  def __drop_all(self):
+    with self.__lock:
+      callbacks = self.__callbacks
+      self.__callbacks = {}
+    for subscription_id in callbacks:
+      callbacks[subscription_id](subscription_id, None)
+
+  # Reads pushed events until stopped.  A broken socket drops all subscriptions (their data may be stale)
+  # and is reopened after a delay.
+  def __read_loop(self):
+    while self.__running:
+      try:
+        if self.__socket is None:
+          self.__socket = self.__open()
+        message = self.__socket.recv()
+        if message:
+          self.handle(message)
+      except Exception as e:
+        if not self.__running:
+          return
+        print(f"Subscription socket failed. Exception {e}")
+        self.__close()
+        self.__drop_all()
+        self.__stop.wait(self.refresh_interval)
+
+  def __refresh_loop(self):
+    while not self.__stop.wait(self.refresh_interval):
+      self.refresh()
@@ -0,0 +1,102 @@
+import pytest
+
+from cache import Cache, apply_event, dn_related, path_dn, payload_objects
+
+
+TENANTS = {'totalCount': '2', 'imdata': [
+  {'fvTenant': {'attributes': {'dn': 'uni/tn-a', 'name': 'a'}}},
+  {'fvTenant': {'attributes': {'dn': 'uni/tn-b', 'name': 'b'}}},
+]}
+
+
+def test_payload_objects_includes_children():
+  payload = {'fvTenant': {'attributes': {'dn': 'uni/tn-a'}, 'children': [
+    {'fvBD': {'attributes': {'rn': 'BD-bd1'}, 'children': [{'fvRsCtx': {'attributes': {'tnFvCtxName': 'v'}}}]}},
+    {'fvAp': {'attributes': {'dn': 'uni/tn-a/ap-app'}}},
+  ]}}
+  assert payload_objects(payload) == [('fvTenant', 'uni/tn-a'), ('fvBD', 'uni/tn-a/BD-bd1'), ('fvRsCtx', None),
+                                      ('fvAp', 'uni/tn-a/ap-app')]
+  assert payload_objects({'imdata': [payload]}) == payload_objects(payload)
+
+
+@pytest.mark.parametrize('dn1, dn2, related', [
+  ('uni/tn-a', 'uni/tn-a', True),
+  ('uni/tn-a', 'uni/tn-a/BD-bd1', True),
+  ('uni/tn-a/BD-bd1', 'uni/tn-a', True),
+  ('uni/tn-a', 'uni/tn-ab', False),
+  ('uni/tn-a/BD-bd1', 'uni/tn-a/BD-bd2', False),
+])
+def test_dn_related(dn1, dn2, related):
+  assert dn_related(dn1, dn2) == related
+
+
+def test_path_dn():
+  assert path_dn('/mo/uni/tn-common.json') == 'uni/tn-common'
+  assert path_dn('uni/tn-common') == 'uni/tn-common'
+
+
+# One entry of each kind: class queries, mo queries, and a class query returning subtrees
+ENTRIES = [('class/fvTenant.json', None), ('class/fvBD.json', None), ('mo/uni/tn-a.json', None),
+           ('mo/uni/tn-b.json', None), ('class/fvCtx.json', {'rsp-subtree': 'full'})]
+
+
+def filled():
+  cache = Cache()
+  for path, parameters in ENTRIES:
+    cache.put(path, parameters, {'totalCount': '0', 'imdata': []})
+  return cache
+
+
+def cached(cache):
+  return [path for path, parameters in ENTRIES if cache.get(path, parameters) is not None]
+
+
+def test_invalidate_removes_class_related_mo_and_subtree_entries():
+  cache = filled()
+  cache.invalidate('fvBD', 'uni/tn-a/BD-bd1')
+  assert cached(cache) == ['class/fvTenant.json', 'mo/uni/tn-b.json']
+
+
+def test_invalidate_payload():
+  cache = filled()
+  cache.invalidate_payload({'fvTenant': {'attributes': {'dn': 'uni/tn-b', 'descr': 'x'}}})
+  assert cached(cache) == ['class/fvBD.json', 'mo/uni/tn-a.json']
+  # An XML payload can not be inspected and clears the cache
+  cache.invalidate_payload("<fvTenant dn='uni/tn-a'/>")
+  assert cached(cache) == []
+
+
+def test_result_fetched_before_invalidation_is_not_stored():
+  cache = Cache()
+  generation = cache.generation
+  cache.invalidate('fvTenant', 'uni/tn-a')
+  assert not cache.put('class/fvTenant.json', None, TENANTS, generation=generation)
+  assert cache.get('class/fvTenant.json') is None
+  assert cache.put('class/fvTenant.json', None, TENANTS, generation=cache.generation)
+
+
+def test_hits_share_the_stored_result():
+  cache = Cache()
+  cache.put('class/fvTenant.json', None, TENANTS)
+  assert cache.get('class/fvTenant.json') is cache.get('class/fvTenant.json')
+
+
+def test_events_do_not_change_results_handed_out():
+  cache = Cache()
+  cache.put('class/fvTenant.json', None, TENANTS, subscription='1')
+  before = cache.get('class/fvTenant.json')
+  assert cache.apply('1', [{'fvTenant': {'attributes': {'dn': 'uni/tn-a', 'descr': 'x', 'status': 'modified'}}},
+                           {'fvTenant': {'attributes': {'dn': 'uni/tn-b', 'status': 'deleted'}}}])
+  after = cache.get('class/fvTenant.json')
+  assert after['totalCount'] == '1'
+  assert after['imdata'][0]['fvTenant']['attributes'] == {'dn': 'uni/tn-a', 'name': 'a', 'descr': 'x'}
+  assert before is TENANTS
+  assert TENANTS['totalCount'] == '2'
+  assert 'descr' not in TENANTS['imdata'][0]['fvTenant']['attributes']
+
+
+def test_apply_event_needs_a_known_object():
+  content = {'totalCount': '0', 'imdata': []}
+  assert not apply_event(content, {'fvTenant': {'attributes': {'dn': 'uni/tn-c', 'status': 'modified'}}})
+  assert apply_event(content, {'fvTenant': {'attributes': {'dn': 'uni/tn-c', 'status': 'created'}}})
+  assert content['totalCount'] == '1'
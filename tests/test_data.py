@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import data
+import decoder
+
+
+OBJECTS = [{'fvBD': {'attributes': {'dn': f'uni/tn-t/BD-bd{n}', 'name': f'bd{n}', 'descr': 'say "hi" ]}',
+                                    'mac': '00:22:BD:F8:19:FF'},
+                     'children': [{'fvRsCtx': {'attributes': {'tnFvCtxName': 'vrf', 'name': 'x'}}}]}}
+           for n in range(20)]
+BODY = json.dumps({'totalCount': '20', 'imdata': OBJECTS}).encode()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1024 * 1024])
+def test_iter_body_across_chunks(chunk_size):
+  header = {}
+  assert list(decoder.iter_body(BODY, header, chunk_size)) == OBJECTS
+  assert header == {'totalCount': 20, 'imdata': True}
+
+
+def test_iter_body_incomplete():
+  with pytest.raises(Exception):
+    list(decoder.iter_body(BODY[:-20]))
+
+
+def test_project_keeps_listed_attributes():
+  projection = data.project(BODY, ['name'])
+  assert projection['totalCount'] == '20'
+  assert projection['imdata'][3] == {'fvBD': {'attributes': {'name': 'bd3'},
+                                              'children': [{'fvRsCtx': {'attributes': {'name': 'x'}}}]}}
+
+
+def test_lazy_data_stays_lazy_for_new_attributes():
+  d = data.Data(BODY, lazy=True)
+  assert d.value('name') == 'bd0'
+  assert d.count == 20
+  assert d.attribute('descr')[0] == 'say "hi" ]}'
+  assert d.lazy
+  assert d.fields == {'name', 'descr'}
+  assert d.content == {'totalCount': '20', 'imdata': OBJECTS}
+  assert not d.lazy
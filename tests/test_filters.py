@@ -0,0 +1,100 @@
+import pytest
+
+import filters
+from filters import F
+
+
+def bd(**attributes):
+  return {'fvBD': {'attributes': dict({'dn': 'uni/tn-common/BD-bd1', 'name': 'bd1'}, **attributes)}}
+
+
+@pytest.mark.parametrize('text, attributes, match', [
+  ('eq(fvBD.name, "bd1")', {}, True),
+  ('eq(fvBD.name, "bd2")', {}, False),
+  ('ne(fvBD.name, "bd2")', {}, True),
+  ('ne(fvBD.name, "bd1")', {}, False),
+  ('lt(fvBD.mtu, "9000")', {'mtu': '1500'}, True),
+  ('lt(fvBD.mtu, "1500")', {'mtu': '1500'}, False),
+  ('gt(fvBD.mtu, "1500")', {'mtu': '9000'}, True),
+  ('gt(fvBD.mtu, "9000")', {'mtu': '9000'}, False),
+  ('le(fvBD.mtu, "1500")', {'mtu': '1500'}, True),
+  ('le(fvBD.mtu, "1499")', {'mtu': '1500'}, False),
+  ('ge(fvBD.mtu, "1500")', {'mtu': '1500'}, True),
+  ('ge(fvBD.mtu, "1501")', {'mtu': '1500'}, False),
+  ('wcard(fvBD.dn, "/tn-common/")', {}, True),
+  ('wcard(fvBD.dn, "^uni/tn-mgmt")', {}, False),
+  ('and(eq(fvBD.name, "bd1"), wcard(fvBD.dn, "common"))', {}, True),
+  ('and(eq(fvBD.name, "bd1"), wcard(fvBD.dn, "mgmt"))', {}, False),
+  ('or(eq(fvBD.name, "bd2"), wcard(fvBD.dn, "common"))', {}, True),
+  ('or(eq(fvBD.name, "bd2"), wcard(fvBD.dn, "mgmt"))', {}, False),
+  ('not(eq(fvBD.name, "bd2"))', {}, True),
+  ('not(eq(fvBD.name, "bd1"))', {}, False),
+])
+def test_operators(text, attributes, match):
+  assert filters.parse(text).matches(bd(**attributes)) == match
+
+
+# Numbers compare as numbers, anything else as strings
+@pytest.mark.parametrize('condition, value, match', [
+  (F.lt('fvBD.mtu', 10), '9', True),
+  (F.lt('fvBD.mtu', 10), '10.5', False),
+  (F.lt('fvBD.mtu', '1.5'), '1.25', True),
+  (F.lt('fvBD.mtu', 'b'), 'a', True),
+  (F.lt('fvBD.mtu', '10'), 'a', False),
+  (F.gt('fvBD.mtu', '9'), 'a', True),
+])
+def test_numeric_and_string_ordering(condition, value, match):
+  assert condition.matches(bd(mtu=value)) == match
+
+
+@pytest.mark.parametrize('value, match', [('100', True), ('150', True), ('200', True), ('99', False),
+                                          ('201', False)])
+def test_bw_is_inclusive(value, match):
+  assert F.bw('fvBD.mtu', 100, 200).matches(bd(mtu=value)) == match
+
+
+# A condition on another class, or on an attribute the object lacks, does not match
+def test_other_class_does_not_match():
+  assert not F.eq('fvCtx.name', 'bd1').matches(bd())
+  assert not F.ne('fvCtx.name', 'bd2').matches(bd())
+  assert not F.eq('fvBD.descr', '').matches(bd())
+  assert F.or_(F.eq('fvCtx.name', 'bd1'), F.eq('fvBD.name', 'bd1')).matches(bd())
+  assert (~F.eq('fvCtx.name', 'bd1')).matches(bd())
+
+
+def test_escaped_quotes():
+  condition = filters.parse('eq(fvBD.descr, "say \\"hi\\", (now)")')
+  assert condition.values == ('say "hi", (now)',)
+  assert condition.matches(bd(descr='say "hi", (now)'))
+  assert filters.parse(str(condition)) == condition
+
+
+def test_canonical_form():
+  a = F.eq('fvBD.name', 'bd1')
+  b = F.wcard('fvBD.dn', 'common')
+  assert str(a & b) == str(b & a) == str(F.and_(a, F.and_(b, a)))
+  assert ~~a == a
+  assert filters.canonical('and(wcard(fvBD.dn, "common"),eq(fvBD.name, "bd1"))') == str(a & b)
+  assert filters.canonical('unknown(fvBD.name)') == 'unknown(fvBD.name)'
+
+
+@pytest.mark.parametrize('text', [
+  'eq(fvBD.name "bd1")',
+  'eq(fvBD.name, "bd1"',
+  'eq(name, "bd1")',
+  'eq(fvBD.name)',
+  'bw(fvBD.mtu, "1")',
+  'not(eq(fvBD.name, "a"), eq(fvBD.name, "b"))',
+  'foo(fvBD.name, "bd1")',
+  'eq(fvBD.name, "bd1") extra',
+  'fvBD.name',
+  'eq(fvBD.name, "bd1"))',
+])
+def test_malformed_filters(text):
+  with pytest.raises(Exception, match='Invalid filter'):
+    filters.parse(text)
+
+
+def test_condition_is_abstract():
+  with pytest.raises(TypeError):
+    filters.Condition()
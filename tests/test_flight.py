@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from flight import SingleFlight
+
+
+def test_do_async_coalesces_identical_calls():
+  flight = SingleFlight()
+  calls = []
+
+  async def fetch():
+    calls.append(1)
+    await asyncio.sleep(0.01)
+    return {'imdata': []}
+
+  async def run():
+    return await asyncio.gather(*[flight.do_async('key', fetch) for _ in range(3)])
+
+  results = asyncio.run(run())
+  assert calls == [1]
+  assert results == [{'imdata': []}] * 3
+  assert results[0] is not results[1]
+  assert flight.stats == {'requests': 1, 'shared': 2}
+  assert flight.in_flight == 0
+
+
+# The first caller timing out must not cancel the request the other callers are waiting for
+def test_do_async_leader_timeout_does_not_cancel_waiters():
+  flight = SingleFlight()
+
+  async def fetch():
+    await asyncio.sleep(0.05)
+    return 'value'
+
+  async def run():
+    leader = asyncio.ensure_future(asyncio.wait_for(flight.do_async('key', fetch), timeout=0.01))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(flight.do_async('key', fetch))
+    with pytest.raises(asyncio.TimeoutError):
+      await leader
+    return await waiter
+
+  assert asyncio.run(run()) == 'value'
+  assert flight.in_flight == 0
+
+
+def test_do_async_leader_timeout_passes_exception_to_waiters():
+  flight = SingleFlight()
+
+  async def fetch():
+    await asyncio.sleep(0.05)
+    raise Exception('Query failed.')
+
+  async def run():
+    leader = asyncio.ensure_future(asyncio.wait_for(flight.do_async('key', fetch), timeout=0.01))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(flight.do_async('key', fetch))
+    with pytest.raises(asyncio.TimeoutError):
+      await leader
+    with pytest.raises(Exception, match='Query failed.'):
+      await waiter
+
+  asyncio.run(run())
+  assert flight.in_flight == 0
+
+
+def test_do_shares_result_across_threads():
+  flight = SingleFlight()
+  started = threading.Event()
+  release = threading.Event()
+  results = []
+
+  def fetch():
+    started.set()
+    release.wait(5)
+    return ['value']
+
+  leader = threading.Thread(target=lambda: results.append(flight.do('key', fetch)))
+  leader.start()
+  started.wait(5)
+  waiter = threading.Thread(target=lambda: results.append(flight.do('key', fetch)))
+  waiter.start()
+  while flight.stats['shared'] == 0:
+    time.sleep(0.001)
+  release.set()
+  leader.join()
+  waiter.join()
+  assert results == [['value'], ['value']]
+  assert flight.stats == {'requests': 1, 'shared': 1}
+
+
+# A call started after detach (e.g. a get after a post) must not join a call started before it
+def test_do_async_detach_starts_new_call():
+  flight = SingleFlight()
+  calls = []
+
+  async def fetch():
+    calls.append(1)
+    await asyncio.sleep(0.01)
+    return len(calls)
+
+  async def run():
+    before = asyncio.ensure_future(flight.do_async('key', fetch))
+    await asyncio.sleep(0)
+    flight.detach()
+    after = asyncio.ensure_future(flight.do_async('key', fetch))
+    return await before, await after
+
+  assert asyncio.run(run()) == (2, 2)
+  assert calls == [1, 1]
+  assert flight.stats == {'requests': 2, 'shared': 0}
+  assert flight.in_flight == 0
+
+
+def test_do_detach_keeps_the_new_call():
+  flight = SingleFlight()
+  started = threading.Event()
+  release = threading.Event()
+
+  def fetch():
+    started.set()
+    release.wait(5)
+    return 'before'
+
+  leader = threading.Thread(target=lambda: flight.do('key', fetch))
+  leader.start()
+  started.wait(5)
+  flight.detach()
+  assert flight.do('key', lambda: 'after') == 'after'
+  release.set()
+  leader.join()
+  assert flight.in_flight == 0
@@ -0,0 +1,43 @@
+import pytest
+
+import health
+
+
+# Health with its clock under test control
+@pytest.fixture
+def clock(monkeypatch):
+  now = [1000.0]
+  monkeypatch.setattr(health.time, 'monotonic', lambda: now[0])
+  return now
+
+
+def open_health():
+  h = health.Health('10.0.0.1', threshold=1, reset=30)
+  h.failed()
+  assert h.state == health.OPEN
+  return h
+
+
+def test_one_trial_after_reset(clock):
+  h = open_health()
+  with pytest.raises(Exception, match='unreachable'):
+    h.check()
+  clock[0] += 31
+  h.check()
+  with pytest.raises(Exception, match='unreachable'):
+    h.check()
+  h.succeeded()
+  assert h.state == health.HEALTHY
+  h.check()
+
+
+def test_abandoned_trial_lapses(clock):
+  h = open_health()
+  clock[0] += 31
+  # A trial that never reports (e.g. its task was cancelled)
+  h.check()
+  clock[0] += 10
+  with pytest.raises(Exception, match='unreachable'):
+    h.check()
+  clock[0] += 21
+  h.check()
@@ -0,0 +1,29 @@
+import pytest
+
+from snapshot import Snapshot, SnapshotNode
+
+
+def node():
+  snap = Snapshot('10.0.0.1', ('uni',), ())
+  snap.add([{'fvTenant': {'attributes': {'dn': 'uni/tn-common', 'name': 'common'}}}])
+  return SnapshotNode(snap)
+
+
+# Class names starting with letters of "class/" must keep them
+@pytest.mark.parametrize('cls', ['l1PhysIf', 'lldpAdjEp', 'cdpAdjEp', 'aaaUser', 'syslogGroup'])
+def test_output_class(cls):
+  query = node().query(cls)
+  assert query.output_class == cls
+
+
+@pytest.mark.parametrize('cls', ['l1PhysIf', 'lldpAdjEp', 'cdpAdjEp', 'aaaUser', 'syslogGroup'])
+def test_filter_shortcut_resolves_against_class(cls):
+  query = node().query(cls, filter='id=eth1/1')
+  assert query.filter == f'eq({cls}.id, "eth1/1")'
+
+
+# dns ending in letters of ".json" must keep them
+def test_filter_shortcut_resolves_against_mo_class():
+  query = node().query('uni/tn-common', filter='name=common')
+  assert query.output_class == 'fvTenant'
+  assert query.filter == 'eq(fvTenant.name, "common")'
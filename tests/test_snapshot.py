@@ -0,0 +1,45 @@
+import pytest
+
+from fabric import Fabric
+from snapshot import Snapshot, SnapshotNode
+
+
+def snapshot():
+  snap = Snapshot('10.0.0.1', (), ('fabricNode', 'topSystem'))
+  snap.add([
+    {'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-1', 'id': '1', 'name': 'apic1', 'role': 'controller'}}},
+    {'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-101', 'id': '101', 'name': 'leaf101', 'role': 'leaf'}}},
+    {'topSystem': {'attributes': {'dn': 'topology/pod-1/node-1/sys', 'id': '1', 'podId': '1', 'name': 'apic1',
+                                  'role': 'controller', 'oobMgmtAddr': '10.0.0.1'}}},
+    {'topSystem': {'attributes': {'dn': 'topology/pod-1/node-101/sys', 'id': '101', 'podId': '1', 'name': 'leaf101',
+                                  'role': 'leaf', 'oobMgmtAddr': '10.0.0.101'}}},
+  ])
+  return snap
+
+
+def test_snapshot_node_name():
+  node = SnapshotNode(snapshot())
+  assert node.name == 'apic1'
+  assert node.id == 1
+  assert node.dn == 'topology/pod-1/node-1/sys'
+
+
+def test_snapshot_fabric_node_handle_name():
+  fab = Fabric(SnapshotNode(snapshot()))
+  leaf = fab.node(101)
+  assert leaf.address == '10.0.0.101'
+  assert leaf.name == 'leaf101'
+  assert leaf.role == 'leaf'
+  assert fab.node(101) is leaf
+
+
+# Only classes pulled in full answer class queries.  fvBD objects under a root may be only some of them.
+def test_class_queries_need_pulled_classes():
+  snap = snapshot()
+  snap.roots = ['uni/tn-common']
+  snap.add([{'fvBD': {'attributes': {'dn': 'uni/tn-common/BD-default', 'name': 'default'}}}])
+  assert snap.covers_class('fabricNode')
+  assert not snap.covers_class('fvBD')
+  assert snap.get('mo/uni/tn-common/BD-default.json')['totalCount'] == '1'
+  with pytest.raises(Exception, match='not in the snapshot'):
+    snap.get('class/fvBD.json')
@@ -0,0 +1,184 @@
+import json
+import queue
+import time
+
+from cache import Cache
+from subscription import SubscriptionManager
+
+
+# Websocket stand-in: recv() returns the pushed messages, and raises once the socket is broken or closed
+class FakeSocket(object):
+  def __init__(self):
+    self.messages = queue.Queue()
+    self.closed = False
+
+  def push(self, message):
+    self.messages.put(json.dumps(message))
+
+  def fail(self):
+    self.messages.put(None)
+
+  def recv(self):
+    message = self.messages.get(timeout=5)
+    if message is None:
+      raise Exception('Connection lost.')
+    return message
+
+  def close(self):
+    self.closed = True
+    self.messages.put(None)
+
+
+class FakeNode(object):
+  token = 'token'
+  address = 'apic'
+
+  def _url(self, path):
+    return f'https://apic/api/{path}'
+
+
+class FakeResponse(object):
+  def __init__(self, status_code):
+    self.status_code = status_code
+
+
+# subscriptionRefresh stand-in answering with a fixed status per subscription id
+class FakeSession(object):
+  def __init__(self, status=None):
+    self.status = status if status is not None else {}
+    self.refreshed = []
+
+  def get(self, url, params=None, **kwargs):
+    self.refreshed.append(params['id'])
+    return FakeResponse(self.status.get(params['id'], 200))
+
+
+def tenant(name, **attributes):
+  return {'fvTenant': {'attributes': dict({'dn': f'uni/tn-{name}', 'name': name}, **attributes)}}
+
+
+def cached(cache, subscription='1'):
+  content = {'totalCount': '2', 'imdata': [tenant('a'), tenant('b')]}
+  assert cache.put('class/fvTenant.json', None, content, subscription=subscription)
+
+
+def names(cache):
+  content = cache.get('class/fvTenant.json')
+  return None if content is None else [o['fvTenant']['attributes']['name'] for o in content['imdata']]
+
+
+def wait_for(condition, timeout=5):
+  end = time.monotonic() + timeout
+  while time.monotonic() < end:
+    if condition():
+      return True
+    time.sleep(0.01)
+  return False
+
+
+def manager(sockets, refresh_interval=60):
+  def connect(url):
+    sockets.append(FakeSocket())
+    return sockets[-1]
+  return SubscriptionManager(FakeNode(), refresh_interval, connect)
+
+
+def test_events_update_cached_result():
+  cache = Cache()
+  cached(cache)
+  sockets = []
+  subscriptions = manager(sockets)
+  subscriptions.subscribe('1', cache.apply)
+  subscriptions.start()
+  try:
+    sockets[0].push({'subscriptionId': ['1'], 'imdata': [tenant('c', status='created')]})
+    assert wait_for(lambda: names(cache) == ['a', 'b', 'c'])
+    sockets[0].push({'subscriptionId': ['1'], 'imdata': [tenant('a', descr='changed', status='modified')]})
+    assert wait_for(lambda: cache.get('class/fvTenant.json')['imdata'][0]['fvTenant']['attributes'].get('descr')
+                    == 'changed')
+    sockets[0].push({'subscriptionId': ['1'], 'imdata': [tenant('b', status='deleted')]})
+    assert wait_for(lambda: names(cache) == ['a', 'c'])
+    assert cache.get('class/fvTenant.json')['totalCount'] == '2'
+  finally:
+    subscriptions.stop()
+
+
+def test_events_of_other_subscriptions_are_ignored():
+  cache = Cache()
+  cached(cache)
+  subscriptions = SubscriptionManager(FakeNode())
+  subscriptions.subscribe('1', cache.apply)
+  subscriptions.handle({'subscriptionId': ['2'], 'imdata': [tenant('c', status='created')]})
+  assert names(cache) == ['a', 'b']
+
+
+# An event that can not be applied in place drops the entry, so the next get fetches it again
+def test_unappliable_event_drops_entry():
+  cache = Cache()
+  cached(cache)
+  subscriptions = SubscriptionManager(FakeNode())
+  subscriptions.subscribe('1', cache.apply)
+  subscriptions.handle({'subscriptionId': '1', 'imdata': [tenant('c', status='modified')]})
+  assert names(cache) is None
+  assert subscriptions.subscription_ids == []
+
+
+# A broken socket drops every subscribed entry (events may have been missed) and the socket is reopened
+def test_reconnect_after_socket_failure():
+  cache = Cache()
+  cached(cache)
+  sockets = []
+  subscriptions = manager(sockets, refresh_interval=0.05)
+  subscriptions.session = FakeSession()
+  subscriptions.subscribe('1', cache.apply)
+  subscriptions.start()
+  try:
+    sockets[0].fail()
+    assert wait_for(lambda: names(cache) is None)
+    assert subscriptions.subscription_ids == []
+    assert wait_for(lambda: len(sockets) == 2)
+    cached(cache, '2')
+    subscriptions.subscribe('2', cache.apply)
+    sockets[1].push({'subscriptionId': ['2'], 'imdata': [tenant('c', status='created')]})
+    assert wait_for(lambda: names(cache) == ['a', 'b', 'c'])
+  finally:
+    subscriptions.stop()
+  assert sockets[1].closed
+
+
+def test_refresh_keeps_live_and_drops_lost_subscriptions():
+  cache = Cache()
+  cached(cache, '1')
+  cache.put('class/fvBD.json', None, {'totalCount': '0', 'imdata': []}, subscription='2')
+  subscriptions = SubscriptionManager(FakeNode())
+  subscriptions.session = FakeSession({'2': 400})
+  subscriptions.subscribe('1', cache.apply)
+  subscriptions.subscribe('2', cache.apply)
+  subscriptions.refresh()
+  assert sorted(subscriptions.session.refreshed) == ['1', '2']
+  assert subscriptions.subscription_ids == ['1']
+  assert names(cache) == ['a', 'b']
+  assert cache.get('class/fvBD.json') is None
+
+
+# Subscriptions whose entry was evicted are not refreshed again
+def test_refresh_skips_subscriptions_no_longer_cached():
+  cache = Cache()
+  cached(cache, '1')
+  subscriptions = SubscriptionManager(FakeNode())
+  subscriptions.session = FakeSession()
+  subscriptions.subscribe('1', cache.apply)
+  cache.clear()
+  subscriptions.refresh()
+  assert subscriptions.session.refreshed == []
+  assert subscriptions.subscription_ids == []
+
+
+def test_stop_reports_subscriptions_lost():
+  lost = []
+  subscriptions = SubscriptionManager(FakeNode(), connect=lambda url: FakeSocket())
+  subscriptions.subscribe('1', lambda subscription_id, imdata: lost.append((subscription_id, imdata)))
+  subscriptions.start()
+  subscriptions.stop()
+  assert lost == [('1', None)]
+  assert not subscriptions.running
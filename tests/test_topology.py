@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import pytest
+
+from topology import Topology
+
+
+TOPOLOGY = {'totalCount': '2', 'imdata': [
+  {'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-101', 'id': '101', 'role': 'leaf'}}},
+  {'topSystem': {'attributes': {'dn': 'topology/pod-1/node-101/sys', 'id': '101', 'oobMgmtAddr': '10.0.0.101'}}},
+]}
+
+
+# APIC stand-in answering the topology query after a delay
+class FakeApic(object):
+  address = '10.0.0.1'
+  subscriptions = None
+
+  def __init__(self):
+    self.gets = 0
+
+  async def get(self, path, parameters=None, raw=False):
+    self.gets += 1
+    await asyncio.sleep(0.01)
+    return json.dumps(TOPOLOGY).encode()
+
+
+class FakeFabric(object):
+  def __init__(self):
+    self.apic = FakeApic()
+
+
+def test_concurrent_async_loads_share_one_request():
+  fab = FakeFabric()
+  topology = Topology(fab)
+
+  async def run():
+    return await asyncio.gather(*[topology.current_async() for _ in range(4)])
+
+  for result in asyncio.run(run()):
+    assert result.oob_address(101) == '10.0.0.101'
+  assert fab.apic.gets == 1
+  assert topology.loads == 1
+
+
+ERROR = {'totalCount': '1', 'imdata': [{'error': {'attributes': {'code': '500', 'text': 'Internal error'}}}]}
+
+
+# APIC stand-in answering the topology query with an error body first
+class FailingApic(FakeApic):
+  def __init__(self, bodies):
+    super().__init__()
+    self.bodies = bodies
+
+  def get(self, path, parameters=None, raw=False):
+    self.gets += 1
+    return self.bodies.pop(0)
+
+
+@pytest.mark.parametrize('body', [json.dumps(ERROR).encode(), b'<html><body>Bad gateway</body></html>'])
+def test_failed_load_is_not_cached(body):
+  fab = FakeFabric()
+  fab.apic = FailingApic([body, json.dumps(TOPOLOGY).encode()])
+  topology = Topology(fab)
+  with pytest.raises(Exception, match='Unable to load the topology'):
+    topology.current()
+  assert topology.stale
+  assert topology.loads == 0
+  assert topology.current().oob_address(101) == '10.0.0.101'
+  assert fab.apic.gets == 2
@@ -0,0 +1,166 @@
+import asyncio      # asyncio module for the lock serializing topology loads on an event loop
+import threading    # threading module for the lock serializing topology loads
+import time         # time module for the topology age
+
+import data
+
+
+# Classes a topology is loaded from
+CLASSES = ['fabricNode', 'topSystem']
+
+
+# Topology of a fabric: its nodes (fabricNode) with their system information (topSystem), loaded with one
+# subtree query of topology and indexed by id, role, pod and OOB address.
+# The index is served from memory until it is older than ttl seconds or, when the fabric's APIC node is running
+# subscriptions, until a node is added, changed or removed.  Use current() (current_async() for a fabric of
+# AsyncNodes) to get the topology, reloaded if it is stale, before reading it.
+class Topology(object):
+  def __init__(self, fab, ttl=300):
+    self.fabric = fab
+    self.ttl = ttl
+    self.loaded = None
+    self.loads = 0
+    self.__nodes = {}
+    self.__roles = {}
+    self.__pods = {}
+    self.__addresses = {}
+    self.__changed = False
+    self.__subscription = None
+    self.__lock = threading.Lock()
+    self.__async_lock = asyncio.Lock()
+
+  # A copied fabric loads its own topology
+  def __deepcopy__(self, memo):
+    return None
+
+  @property
+  def stale(self):
+    return self.loaded is None or self.__changed or time.monotonic() - self.loaded > self.ttl
+
+  # Marks the topology as stale, so it is reloaded on the next current()
+  def expire(self):
+    self.__changed = True
+
+  def current(self):
+    if self.stale:
+      with self.__lock:
+        if self.stale:
+          path, parameters = self.__request()
+          self.__load(self.fabric.apic.get(path, parameters, raw=True))
+    return self
+
+  # Concurrent callers finding the topology stale wait for one reload
+  async def current_async(self):
+    if self.stale:
+      async with self.__async_lock:
+        if self.stale:
+          path, parameters = self.__request()
+          self.__load(await self.fabric.apic.get(path, parameters, raw=True))
+    return self
+
+  # Topology loads bypass the node cache.  With subscriptions running, changes to the nodes are pushed.
+  def __request(self):
+    parameters = {'query-target': 'subtree', 'target-subtree-class': ','.join(CLASSES)}
+    subscriptions = self.fabric.apic.subscriptions
+    if subscriptions is not None and subscriptions.running:
+      parameters['subscription'] = 'yes'
+    return 'mo/topology.json', parameters
+
+  # A failed load raises and leaves the topology as it was (stale), so the next current() retries it
+  def __load(self, content):
+    result = data.Data(content)
+    error = load_error(result.content)
+    if error is not None:
+      raise Exception(f'Unable to load the topology of {self.fabric.apic.address}.  {error}')
+    classes = result.split(CLASSES)
+    nodes = {}
+    for o in classes['fabricNode'].imdata:
+      attributes = o['fabricNode']['attributes']
+      dn = attributes['dn']
+      nodes[int(attributes['id'])] = {'id': int(attributes['id']), 'pod': pod_id(dn), 'dn': dn,
+                                      'fabricNode': attributes, 'topSystem': {}}
+    for o in classes['topSystem'].imdata:
+      attributes = o['topSystem']['attributes']
+      node = nodes.get(int(attributes['id']))
+      if node is not None:
+        node['topSystem'] = attributes
+    roles = {}
+    pods = {}
+    addresses = {}
+    for id in sorted(nodes):
+      node = nodes[id]
+      roles.setdefault(node['fabricNode'].get('role'), []).append(id)
+      pods.setdefault(node['pod'], []).append(id)
+      if node['topSystem'].get('oobMgmtAddr') not in [None, '', '0.0.0.0']:
+        addresses[node['topSystem']['oobMgmtAddr']] = id
+    self.__nodes = nodes
+    self.__roles = roles
+    self.__pods = pods
+    self.__addresses = addresses
+    self.__changed = False
+    self.loaded = time.monotonic()
+    self.loads += 1
+    self.__subscribe(result.content)
+
+  def __subscribe(self, content):
+    subscriptions = self.fabric.apic.subscriptions
+    if subscriptions is not None and self.__subscription is not None:
+      subscriptions.unsubscribe(self.__subscription)
+    self.__subscription = content.get('subscriptionId') if type(content) is dict else None
+    if subscriptions is not None and self.__subscription is not None:
+      subscriptions.subscribe(self.__subscription, self.__event)
+
+  # Subscription callback.  Any pushed event, or a lost subscription, makes the topology stale.
+  def __event(self, subscription_id, imdata):
+    if imdata == []:
+      return subscription_id == self.__subscription and not self.__changed
+    self.__changed = True
+    return False
+
+  # Sorted ids of the nodes, optionally only those with the role (controller, spine, leaf) and in the pod
+  def ids(self, role=None, pod=None):
+    ids = self.__roles.get(role, []) if role is not None else sorted(self.__nodes)
+    if pod is not None:
+      ids = [id for id in ids if id in self.__pods.get(int(pod), [])]
+    return list(ids)
+
+  # Topology entry of a node: id, pod, dn, and the fabricNode and topSystem attributes.  None if there is no node.
+  def node(self, id):
+    return self.__nodes.get(int(id))
+
+  # OOB management address of a node
+  def oob_address(self, id):
+    node = self.node(id)
+    return node['topSystem'].get('oobMgmtAddr') if node is not None else None
+
+  # Id of the node with an OOB management address, or None
+  def by_address(self, address):
+    return self.__addresses.get(address)
+
+  @property
+  def pods(self):
+    return sorted(self.__pods)
+
+  # fabricNode attributes of the nodes, in id order
+  def nodes(self, role=None, pod=None):
+    return [dict(self.__nodes[id]['fabricNode']) for id in self.ids(role, pod)]
+
+
+# Reason a topology response is not a topology, or None.  The APIC answers a failed query (with a 4xx/5xx status)
+# with an error object in imdata; a proxy or a server error may answer with a body that is not an imdata document.
+def load_error(content):
+  if type(content) is not dict or type(content.get('imdata')) is not list:
+    return 'The response is not an imdata document.'
+  for o in content['imdata']:
+    if 'error' in o:
+      attributes = o['error'].get('attributes', {})
+      return f'The APIC returned error {attributes.get("code")}: {attributes.get("text")}'
+  return None
+
+
+# Pod id from a dn under topology, e.g. topology/pod-1/node-101 -> 1
+def pod_id(dn):
+  for rn in dn.split('/'):
+    if rn[:4] == 'pod-':
+      return int(rn[4:])
+  return None